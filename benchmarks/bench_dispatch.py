@@ -0,0 +1,238 @@
+"""
+TelegramChat 分发与格式化热路径的离线基准测试
+
+用桩对象代替 PluginServerInterface 与 Bot，构造 Update 后驱动
+on_message → Request → execute_bot_command → CommandBuilder.get / type_check，
+输出每个场景的 ops/sec 与 P50/P99（JSON），便于在版本之间比较
+
+    python benchmarks/bench_dispatch.py --iterations 2000 --output result.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+
+import telegram_chat
+from telegram_chat.backlog import Backlog
+from telegram_chat.bindings import BindingStore
+from telegram_chat.command_builder import CommandBuilder
+from telegram_chat.commands import register_commands
+from telegram_chat.config import Config, ConfigManager
+from telegram_chat.info import SystemSampler
+from telegram_chat.outbound import OutboundQueue
+from telegram_chat.request import Request
+from telegram_chat.rcon import RconExecutor
+from telegram_chat.roster import Roster
+
+ADMIN_ID = 10
+USER_ID = 20
+GROUP_ID = -1000
+
+class StubLogger(logging.Logger):
+    def __init__(self):
+        super().__init__("bench", logging.INFO)
+
+class StubServer:
+    """
+    PluginServerInterface 的桩实现，只保留插件用到的方法
+    """
+    def __init__(self):
+        self.logger = StubLogger()
+        self.said = 0
+
+    def say(self, text: str): self.said += 1
+    def execute(self, command: str): ...
+    def is_rcon_running(self) -> bool: return True
+    def rcon_query(self, command: str) -> str: return f"ok: {command}"
+    def get_server_pid(self) -> int | None: return None
+    def get_data_folder(self) -> str: return "."
+    def reload_plugin(self, plugin: str): ...
+    def start(self): ...
+    def stop(self): ...
+    def restart(self): ...
+
+class StubBot:
+    async def send_message(self, **kwargs): ...
+
+class StubContext:
+    bot = StubBot()
+
+class StubBotManager:
+    bot = StubBot()
+    pending = 0
+
+    def submit(self, coro):
+        return asyncio.ensure_future(coro)
+
+class StubPlayerApi:
+    def __init__(self, players: list[str]):
+        self.players = players
+
+    def get_player_list(self) -> list[str]:
+        return self.players
+
+def make_update(text: str, user_id: int = USER_ID, chat_id: int = GROUP_ID, chat_type: str = "supergroup") -> Update:
+    return Update.de_json({
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": chat_type, "title": "bench"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "bench"},
+            "text": text,
+        },
+    }, None) # type: ignore
+
+def setup(size: int):
+    """
+    构造包含 size 条绑定、封禁与管理员的数据集
+    """
+    config = Config()
+    config.group = GROUP_ID
+    config.admins = [str(ADMIN_ID)] + [str(100000 + i) for i in range(size)]
+    config.whitelist = {**config.whitelist, "verify_player": False, "add_when_bind": False}
+    config.throttle = {**config.throttle, "enabled": False}
+    ConfigManager.config = config
+    ConfigManager.bindings = BindingStore.from_dict({str(200000 + i): f"player{i}" for i in range(size)})
+    ConfigManager.bindings.bind(ADMIN_ID, "Admin")
+    ConfigManager.bindings.bind(USER_ID, "User")
+    ConfigManager.ban_list = [300000 + i for i in range(size)]
+    ConfigManager.index_members()
+    ConfigManager.storage = type("NullStorage", (), {"__getattr__": lambda self, name: lambda *args: None})()
+    ConfigManager.logger = StubLogger()
+    ConfigManager.bot = StubBotManager() # type: ignore
+    ConfigManager.outbound = OutboundQueue(StubBot().send_message, ConfigManager.logger, rate=1e9, burst=1e9) # type: ignore
+    ConfigManager.rcon = RconExecutor(cache_ttl=0)
+    ConfigManager.sampler = SystemSampler()
+    # 关闭同一聊天的 /list 去重，否则除第一次外测到的都是提前返回
+    ConfigManager.roster = Roster(StubPlayerApi([f"player{i}" for i in range(20)]).get_player_list, dedup_window=0)
+    ConfigManager.throttle = None
+    ConfigManager.backlog = Backlog(os.path.join(tempfile.mkdtemp(prefix="telegram_chat_bench_"), "update_offset.json"), lambda _: None)
+    telegram_chat.command_tree = register_commands()
+
+async def measure(name: str, func: Callable[[], Awaitable[Any]], iterations: int) -> dict[str, Any]:
+    for _ in range(min(iterations // 10, 100)):
+        try:
+            await func()
+        except Exception: ...
+
+    timings = []
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter_ns()
+        try:
+            await func()
+        except Exception:
+            errors += 1
+        timings.append(time.perf_counter_ns() - t)
+    elapsed = time.perf_counter() - start
+
+    timings.sort()
+    return {
+        "name": name,
+        "iterations": iterations,
+        "errors": errors,
+        "ops_per_sec": iterations / elapsed if elapsed else float("inf"),
+        "p50_us": timings[len(timings) // 2] / 1000,
+        "p99_us": timings[min(len(timings) - 1, int(len(timings) * 0.99))] / 1000,
+        "mean_us": statistics.fmean(timings) / 1000,
+    }
+
+# 每条路由的代表命令：(名称, 命令文本, 发送者, 聊天类型)
+ROUTES = [
+    ("/mc", "/mc hello world", USER_ID, "supergroup"),
+    ("/list", "/list", USER_ID, "supergroup"),
+    ("/bind help", "/bind", USER_ID, "supergroup"),
+    ("/bind query TG", f"/bind query TG {USER_ID}", ADMIN_ID, "supergroup"),
+    ("/bind query ID", "/bind query ID player42", ADMIN_ID, "supergroup"),
+    ("/bind <ID>", "/bind Steve", USER_ID, "supergroup"),
+    ("/whitelist list", "/whitelist list", ADMIN_ID, "supergroup"),
+    ("/command", "/command list", ADMIN_ID, "supergroup"),
+    ("/help", "/help", USER_ID, "supergroup"),
+    ("/ping", "/ping", USER_ID, "supergroup"),
+    ("/info", "/info", ADMIN_ID, "private"),
+    ("/stats", "/stats", ADMIN_ID, "supergroup"),
+    ("unknown command", "/does-not-exist", USER_ID, "supergroup"),
+]
+
+async def run(iterations: int, size: int) -> dict[str, Any]:
+    setup(size)
+    server = StubServer()
+    context = StubContext()
+    results = []
+
+    chat = make_update("just chatting", USER_ID)
+    results.append(await measure("chat forwarding", lambda: telegram_chat.on_message(server, chat, context), iterations)) # type: ignore
+
+    for name, text, user_id, chat_type in ROUTES:
+        chat_id = user_id if chat_type == "private" else GROUP_ID
+        update = make_update(text, user_id, chat_id, chat_type)
+        if name == "/bind <ID>":
+            async def bind_once(update=update):
+                ConfigManager.bindings.unbind(USER_ID)
+                await telegram_chat.on_message(server, update, context) # type: ignore
+            results.append(await measure(f"route {name}", bind_once, iterations))
+        else:
+            results.append(await measure(f"route {name}", lambda update=update: telegram_chat.on_message(server, update, context), iterations)) # type: ignore
+
+    # 权限检查
+    user, admin, banned = make_update("/x", USER_ID), make_update("/x", ADMIN_ID), make_update("/x", 300000 + size - 1)
+
+    async def permission_checks():
+        for update in (user, admin, banned):
+            Request(server, update, context) # type: ignore
+    results.append(await measure("permission checks", permission_checks, iterations))
+
+    # 命令树
+    tree: CommandBuilder = telegram_chat.command_tree
+
+    async def lookup():
+        tree.get("/bind query ID player42")
+        tree.get("/whitelist list")
+        tree.get("/does-not-exist")
+    results.append(await measure("CommandBuilder.get", lookup, iterations))
+
+    async def type_check():
+        CommandBuilder.type_check(("TG", "12345"), [str, str])
+        CommandBuilder.type_check(("12345",), [int])
+    results.append(await measure("CommandBuilder.type_check", type_check, iterations))
+
+    await asyncio.sleep(0)
+    ConfigManager.rcon.shutdown()
+    return {
+        "version": telegram_chat.VERSION_STR,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "dataset_size": size,
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=50000, help="绑定、封禁与管理员数据集的大小")
+    parser.add_argument("--output", help="结果写入的 JSON 文件，默认输出到标准输出")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.iterations, args.size))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+本地模拟的 Telegram Bot API 服务器，用于离线压测
+
+实现 getMe、getUpdates（长轮询）、sendMessage、editMessageText 等接口，
+可注入固定延迟与 429 响应，并按目标速率回放 Update 流
+
+    python benchmarks/fake_bot_api.py --port 8081 --latency 0.05 --rate-limit-every 50
+    # 然后在插件配置中把 telegram.api 设为 http://127.0.0.1:8081/bot
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterable
+from urllib.parse import parse_qs
+
+# 这些参数以 JSON 编码传输，其余按原始字符串处理
+JSON_PARAMS = {"chat_id", "message_id", "reply_to_message_id", "reply_parameters", "entities",
+               "offset", "limit", "timeout", "allowed_updates"}
+
+class FakeBotApi:
+    """
+    模拟的 Bot API 状态：待投递的 Update 队列与收到的消息记录
+    """
+    def __init__(self, latency: float = 0, rate_limit_every: int = 0, retry_after: int = 1):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.updates: list[dict[str, Any]] = []
+        self.sent: list[dict[str, Any]] = []
+        self.edited: list[dict[str, Any]] = []
+        self.injected: dict[int, float] = {}
+        self.calls: dict[str, int] = {}
+        self.rate_limited = 0
+        self._cond = threading.Condition()
+        self._update_id = itertools.count(1)
+        self._message_id = itertools.count(1)
+        self._server: ThreadingHTTPServer | None = None
+
+    # 服务器
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        在后台线程中启动服务器，返回供插件使用的 API 地址
+        """
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args): ...
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                method = self.path.rsplit("/", 1)[-1]
+                status, payload = api.handle(method, api.parse(body, self.headers.get("Content-Type", "")))
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="FakeBotApi", daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}/bot"
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        with self._cond: self._cond.notify_all()
+
+    @staticmethod
+    def parse(body: bytes, content_type: str) -> dict[str, Any]:
+        if not body: return {}
+        if content_type.startswith("application/json"):
+            return json.loads(body)
+        params: dict[str, Any] = {}
+        for key, values in parse_qs(body.decode(), keep_blank_values=True).items():
+            value = values[0]
+            params[key] = json.loads(value) if key in JSON_PARAMS else value
+        return params
+
+    def handle(self, method: str, params: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": self.get_updates(params)}
+
+        if self.latency: time.sleep(self.latency)
+        if method in ("sendMessage", "editMessageText") and self.rate_limit_every and self.calls[method] % self.rate_limit_every == 0:
+            self.rate_limited += 1
+            return 429, {"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {self.retry_after}",
+                         "parameters": {"retry_after": self.retry_after}}
+
+        match method:
+            case "getMe":
+                result: Any = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot",
+                               "can_join_groups": True, "can_read_all_group_messages": True, "supports_inline_queries": False}
+            case "sendMessage":
+                result = self.record(self.sent, params)
+            case "editMessageText":
+                result = self.record(self.edited, params)
+            case _:
+                result = True
+        return 200, {"ok": True, "result": result}
+
+    def record(self, log: list[dict[str, Any]], params: dict[str, Any]) -> dict[str, Any]:
+        reply_to = params.get("reply_to_message_id")
+        if reply_to is None and isinstance(params.get("reply_parameters"), dict):
+            reply_to = params["reply_parameters"].get("message_id")
+        log.append({"time": time.perf_counter(), "chat_id": params.get("chat_id"), "text": params.get("text"), "reply_to": reply_to})
+        return {
+            "message_id": params.get("message_id") or next(self._message_id),
+            "date": int(time.time()),
+            "chat": {"id": params.get("chat_id"), "type": "supergroup", "title": "fake"},
+            "text": params.get("text", ""),
+        }
+
+    def get_updates(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        deadline = time.monotonic() + float(params.get("timeout") or 0)
+        with self._cond:
+            if offset:
+                self.updates = [u for u in self.updates if u["update_id"] >= offset]
+            while not self.updates and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            return self.updates[:limit]
+
+    # 回放
+    def inject(self, message: dict[str, Any]):
+        """
+        把一条消息作为新的 Update 加入队列，并记录注入时间（以 message_id 为键）
+        """
+        message = dict(message)
+        message.setdefault("message_id", next(self._message_id))
+        message.setdefault("date", int(time.time()))
+        with self._cond:
+            self.injected[message["message_id"]] = time.perf_counter()
+            self.updates.append({"update_id": next(self._update_id), "message": message})
+            self._cond.notify_all()
+
+    def replay(self, messages: Iterable[dict[str, Any]], rate: float, stop: threading.Event | None = None) -> int:
+        """
+        按每秒 rate 条的速率注入消息，返回注入的数量
+        """
+        start = time.perf_counter()
+        count = 0
+        for count, message in enumerate(messages, 1):
+            if stop is not None and stop.is_set(): return count - 1
+            delay = start + (count - 1) / rate - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+            self.inject(message)
+        return count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0, help="每次 API 调用的额外延迟（秒）")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="每 N 次发送返回一次 429")
+    parser.add_argument("--replay", help="要回放的消息文件，每行一个 Message JSON")
+    parser.add_argument("--rate", type=float, default=10, help="回放速率（条/秒）")
+    args = parser.parse_args()
+
+    api = FakeBotApi(args.latency, args.rate_limit_every)
+    print(f"Fake Bot API listening on {api.serve(args.host, args.port)}")
+    try:
+        if args.replay:
+            with open(args.replay, encoding="utf-8") as f:
+                print(f"Replayed {api.replay((json.loads(line) for line in f if line.strip()), args.rate)} messages")
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        api.shutdown()
+
+if __name__ == "__main__":
+    main()
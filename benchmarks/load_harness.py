@@ -0,0 +1,199 @@
+"""
+TelegramChat 端到端压测
+
+启动本地模拟的 Bot API（fake_bot_api.py），用桩 PluginServerInterface 完整执行 on_load，
+按目标速率回放群聊消息与命令，同时从“游戏内”产生聊天消息，
+统计轮询 → 分发 → 回复、TG → MC 转发以及 send_to_group 扇出的吞吐量与延迟，全程无需联网
+
+    python benchmarks/load_harness.py --rate 50 --duration 10 --latency 0.02 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotApi
+
+import telegram_chat
+from telegram_chat.config import Config
+
+GROUP_ID = -1000
+ADMIN_ID = 10
+COMMANDS = ["/ping", "/list", "/help", "/bind"]
+
+class HarnessServer:
+    """
+    足以完成 on_load 的 PluginServerInterface 桩实现
+    """
+    def __init__(self, config: Config, data_folder: str, players: list[str]):
+        self.logger = logging.getLogger("load_harness")
+        self.config = config
+        self.data_folder = data_folder
+        self.players = players
+        self.said: list[tuple[float, str]] = []
+
+    def load_config_simple(self, file_name: str | None = None, default_config: Any = None, *, echo_in_console: bool = True,
+                           target_class: Any = None, **kwargs):
+        return self.config if target_class is not None else default_config
+
+    def save_config_simple(self, config: Any, file_name: str = "config.json", **kwargs): ...
+    def get_data_folder(self) -> str: return self.data_folder
+    def get_server_pid(self) -> int | None: return None
+    def get_plugin_instance(self, plugin_id: str): return self
+    def get_player_list(self) -> list[str]: return self.players
+    def register_help_message(self, *args, **kwargs): ...
+    def register_command(self, *args, **kwargs): ...
+    def is_rcon_running(self) -> bool: return False
+    def execute(self, command: str): ...
+    def say(self, text: str): self.said.append((time.perf_counter(), text))
+
+class Info:
+    def __init__(self, player: str, content: str):
+        self.player = player
+        self.content = content
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values: return {"count": 0}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(len(values) * q))] * 1000
+    return {"count": len(values), "p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99), "max_ms": values[-1] * 1000}
+
+def make_messages(count: int, command_ratio: float, users: int, first_id: int):
+    for i in range(count):
+        user = random.randrange(users) + 100
+        text = random.choice(COMMANDS) if random.random() < command_ratio else f"chat m{first_id + i}"
+        yield {
+            "message_id": first_id + i,
+            "chat": {"id": GROUP_ID, "type": "supergroup", "title": "load"},
+            "from": {"id": user, "is_bot": False, "first_name": f"user{user}"},
+            "text": text,
+        }
+
+def run(args: argparse.Namespace) -> dict[str, Any]:
+    api = FakeBotApi(args.latency, args.rate_limit_every)
+    url = api.serve()
+
+    config = Config()
+    config.group = GROUP_ID
+    config.admins = [str(ADMIN_ID)]
+    config.telegram = {**config.telegram, "token": "1:fake", "api": url}
+    config.storage = {"backend": "json"}
+    config.metrics = {"export_interval": 0}
+    config.throttle = {**config.throttle, "enabled": args.throttle}
+    config.outbound = {**config.outbound, "rate": args.outbound_rate, "burst": args.outbound_burst}
+    server = HarnessServer(config, tempfile.mkdtemp(prefix="telegram_chat_load_"), [f"player{i}" for i in range(20)])
+
+    load_start = time.perf_counter()
+    asyncio.run(telegram_chat.on_load(server, None)) # type: ignore
+    load_time = time.perf_counter() - load_start
+
+    # 游戏内聊天，经 send_to_group 扇出
+    mc_sent: dict[int, float] = {}
+    stop = threading.Event()
+
+    def mc_chat():
+        seq = 0
+        while not stop.wait(1 / args.mc_rate if args.mc_rate > 0 else 3600):
+            mc_sent[seq] = time.perf_counter()
+            telegram_chat.on_user_info(server, Info(f"player{seq % 20}", f"mc {seq}")) # type: ignore
+            seq += 1
+
+    threading.Thread(target=mc_chat, daemon=True).start()
+    messages = list(make_messages(int(args.rate * args.duration), args.command_ratio, args.users, 1_000_000))
+    command_ids = {m["message_id"] for m in messages if m["text"].startswith("/")}
+    start = time.perf_counter()
+    injected = api.replay(messages, args.rate)
+    stop.set()
+
+    # 等待剩余的回复与转发
+    # （部分命令可能因去重、限流或 429 没有回复，因此以一段时间内没有新进展作为结束条件）
+    deadline = time.perf_counter() + args.drain
+    progress, idle_since = -1, time.perf_counter()
+    while time.perf_counter() < deadline:
+        current = len(api.sent) + len(server.said)
+        if current != progress or api.updates:
+            progress, idle_since = current, time.perf_counter()
+        elif time.perf_counter() - idle_since > config.outbound["max_delay"] + 0.5:
+            break
+        time.sleep(0.05)
+    last_event = max([s["time"] for s in api.sent] + [t for t, _ in server.said] + [start])
+    elapsed = last_event - start
+
+    reply_latency = [s["time"] - api.injected[s["reply_to"]] for s in api.sent if s["reply_to"] in api.injected]
+    say_latency = []
+    for t, text in server.said:
+        match = re.search(r"chat m(\d+)", text)
+        if match and int(match.group(1)) in api.injected:
+            say_latency.append(t - api.injected[int(match.group(1))])
+    fanout_latency = []
+    for sent in api.sent:
+        if sent["chat_id"] != GROUP_ID or sent["reply_to"] is not None: continue
+        for seq in re.findall(r"mc (\d+)", sent["text"] or ""):
+            if int(seq) in mc_sent: fanout_latency.append(sent["time"] - mc_sent[int(seq)])
+
+    unload_start = time.perf_counter()
+    telegram_chat.on_unload(server) # type: ignore
+    unload_time = time.perf_counter() - unload_start
+    api.shutdown()
+
+    return {
+        "version": telegram_chat.VERSION_STR,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "load_seconds": load_time,
+        "unload_seconds": unload_time,
+        "elapsed_seconds": elapsed,
+        "injected_updates": injected,
+        "throughput_updates_per_sec": injected / elapsed if elapsed else 0,
+        "replies": percentiles(reply_latency),
+        "tg_to_mc": percentiles(say_latency),
+        "mc_to_tg_lines": len(mc_sent),
+        "mc_to_tg_messages": sum(1 for s in api.sent if s["chat_id"] == GROUP_ID and s["reply_to"] is None),
+        "mc_to_tg": percentiles(fanout_latency),
+        "commands": len(command_ids),
+        "unanswered_commands": len(command_ids - {s["reply_to"] for s in api.sent}),
+        "api_calls": api.calls,
+        "api_rate_limited": api.rate_limited,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=50, help="回放的 Update 速率（条/秒）")
+    parser.add_argument("--duration", type=float, default=10, help="回放时长（秒）")
+    parser.add_argument("--command-ratio", type=float, default=0.3, help="命令在回放消息中的比例")
+    parser.add_argument("--users", type=int, default=50, help="参与回放的用户数")
+    parser.add_argument("--mc-rate", type=float, default=5, help="游戏内聊天速率（条/秒）")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟 API 的额外延迟（秒）")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="每 N 次发送返回一次 429")
+    parser.add_argument("--outbound-rate", type=float, default=0.33)
+    parser.add_argument("--outbound-burst", type=int, default=5)
+    parser.add_argument("--throttle", action="store_true", help="启用命令限流")
+    parser.add_argument("--drain", type=float, default=10, help="回放结束后等待剩余处理的最长时间（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="结果写入的 JSON 文件，默认输出到标准输出")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logging.basicConfig(level=logging.WARNING)
+    text = json.dumps(run(args), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,9 @@
+import time
+_import_started = time.perf_counter()
+
+import asyncio
 import logging
+import os
 from typing import Any
 
 from mcdreforged.api.command import CommandContext, GreedyText, Literal
@@ -8,26 +13,264 @@ from telegram import MessageEntity, Update
 from telegram.ext import ContextTypes
 
 from . import tools
+from .backlog import Backlog, DROP, PROCESS, SUMMARIZE
 from .commands import register_commands
-from .commands.types import ChatType, MessageType
 from .command_builder import CommandBuilder
-from .config import ConfigManager
+from .config import Config, ConfigManager
 from .const import VERSION, VERSION_STR
+from .hub import HubClient, HubServer, default_socket_path, split_target
+from .metrics import metrics, timer
+from .outbound import OutboundQueue, utf16_len
+from .permissions import GAME
+from .request import Request
+from .roster import Roster
 from .telegram_manager import TelegramBot
+from .tracing import annotate, span, tracer
+
+# 导入本插件及其依赖的耗时，记录在启动耗时日志中
+_import_seconds = time.perf_counter() - _import_started
 
 # 变量声明
 command_tree: CommandBuilder
 
 # 实用函数
-async def execute_bot_command(server: PluginServerInterface, event: Update, context: CommandContext | ContextTypes.DEFAULT_TYPE, content: str, type: MessageType):
+async def execute_bot_command(request: Request, content: str):
     if content.startswith('/'):
-        func, args = command_tree.get(content)
+        with span("dispatch"):
+            route, func, args = command_tree.match(content)
         if func is not None:
-            server.logger.debug("找到对应的命令处理器！")
-            server.logger.debug(f"命令：{func}，参数：{args}")
-            await func(server, event, context, args, type)
+            permission = getattr(func, "permission", None)
+            if permission is not None and not request.can(permission):
+                request.server.logger.debug("用户 %s 没有权限 %s", request.user_id, permission)
+                metrics.inc("telegram_chat_permission_denied_total", permission=permission, role=request.role)
+                return
+            request.server.logger.debug("找到对应的命令处理器：%s，参数：%s", func, args)
+            annotate(route=route)
+            metrics.inc("telegram_chat_command_dispatch_total", route=route)
+            with timer("telegram_chat_command_duration_seconds", route=route), span("handler"):
+                try:
+                    await func(request, args)
+                except Exception:
+                    metrics.inc("telegram_chat_command_errors_total", route=route)
+                    raise
         else:
-            server.logger.debug("未找到对应的命令处理器！")
+            request.server.logger.debug("未找到对应的命令处理器！")
+
+def register_gauges():
+    """
+    注册各个队列的实时指标
+    """
+    metrics.clear_gauges() # 重载后 Bot 与限流器可能已被替换
+    metrics.gauge("telegram_chat_outbound_pending", lambda: ConfigManager.outbound.pending)
+    for key in ConfigManager.outbound.stats:
+        metrics.gauge("telegram_chat_outbound_messages", lambda key=key: ConfigManager.outbound.stats[key], result=key)
+    metrics.gauge("telegram_chat_bot_pending_calls", lambda: ConfigManager.bot.pending)
+    if ConfigManager.hub is not None:
+        metrics.gauge("telegram_chat_hub_nodes", lambda: len(ConfigManager.hub.nodes) if ConfigManager.hub is not None else 0)
+    for request in getattr(ConfigManager.bot, "requests", ()):
+        metrics.gauge("telegram_chat_http_pool_in_use", lambda request=request: request.in_use, pool=request.pool)
+        metrics.gauge("telegram_chat_http_pool_size", lambda request=request: request.size, pool=request.pool)
+    processor = ConfigManager.bot.update_processor
+    if processor is not None:
+        metrics.gauge("telegram_chat_updates_in_flight", lambda: processor.running)
+        metrics.gauge("telegram_chat_updates_waiting", lambda: processor.waiting)
+    if ConfigManager.throttle is not None:
+        for key in ConfigManager.throttle.stats:
+            metrics.gauge("telegram_chat_throttle_requests", lambda key=key: ConfigManager.throttle.stats[key], result=key) # type: ignore
+
+def start_hub(server: PluginServerInterface):
+    """
+    Hub 模式：在 Bot 的事件循环上监听节点连接
+    """
+    async def on_events(name: str, items: list[dict[str, Any]]):
+        prefix = f"[{name}] "
+        shift = utf16_len(prefix)
+        for item in items:
+            entities = [MessageEntity.de_json({**e, "offset": e["offset"] + shift}, None) for e in item.get("entities", [])]
+            await tools.send_to_group(prefix + item["text"], item["event"], entities=entities)
+
+    async def on_send(kwargs: dict[str, Any]):
+        if kwargs.get("entities"): kwargs["entities"] = [MessageEntity.de_json(e, None) for e in kwargs["entities"]]
+        await tools.send_message(**kwargs)
+
+    hub = ConfigManager.config.hub
+    try:
+        ConfigManager.hub = HubServer(server.logger, hub["socket"] or default_socket_path(server.get_data_folder()),
+                                      hub["name"], hub.get("secret", ""), on_events, on_send, hub["request_timeout"])
+        future = tools.submit(ConfigManager.hub.start())
+        # start() 可能先花 request_timeout 秒探测旧的套接字
+        if future is not None: future.result(timeout=hub["request_timeout"] * 2 + 1)
+    except Exception as e:
+        server.logger.error(f"Hub 启动失败：{e}")
+        ConfigManager.hub = None
+
+def close_outbound():
+    """
+    在 Bot 的事件循环上发出排队中的消息并关闭发送队列，需要在停止 Bot 之前调用
+    """
+    if ConfigManager.outbound is None: return
+    timeout = ConfigManager.outbound.max_delay + 2
+    future = tools.submit(ConfigManager.outbound.close(timeout))
+    try:
+        if future is not None: future.result(timeout=timeout + 1)
+    except Exception: ...
+
+def flush_backlog():
+    """
+    在 Bot 的事件循环上立即转发尚未发出的积压消息摘要
+    """
+    if ConfigManager.backlog is None: return
+    async def flush():
+        ConfigManager.backlog.flush()
+    future = tools.submit(flush())
+    try:
+        if future is not None: future.result(timeout=5)
+        else: ConfigManager.backlog.flush()
+    except Exception: ...
+
+def stop_hub():
+    if ConfigManager.hub is None: return
+    future = tools.submit(ConfigManager.hub.stop())
+    try:
+        if future is not None: future.result(timeout=5)
+    except Exception: ...
+    ConfigManager.hub = None
+
+async def route_to_node(event: Update, content: str) -> bool:
+    """
+    Hub 模式：/命令@节点名 转交给对应节点执行，返回是否已转交
+    """
+    hub = ConfigManager.hub
+    if hub is None: return False
+    command, target = split_target(content)
+    if target is None or target not in hub.nodes: return False
+    return await hub.forward(target, event, command)
+
+def create_bot(server: PluginServerInterface) -> TelegramBot | HubClient:
+    """
+    按配置创建 Bot（节点模式下为 HubClient）并注册消息处理器，尚未启动
+    """
+    async def action(event: Update, context: ContextTypes.DEFAULT_TYPE):
+        await on_message(server, event, context)
+
+    additional_args = {
+        "api": ConfigManager.config.telegram["api"],
+        "timeout": ConfigManager.config.telegram["startup_timeout"],
+        "max_pending": ConfigManager.config.telegram.get("max_pending"),
+        "webhook": ConfigManager.config.telegram.get("webhook"),
+        "concurrent_updates": ConfigManager.config.telegram.get("concurrent_updates"),
+        "drop_pending_updates": ConfigManager.config.backlog["policy"] == DROP,
+        "http": ConfigManager.config.telegram.get("http")
+    }
+    additional_args = {k: v for k, v in additional_args.items() if v is not None} # 过滤掉值为 None 的项
+
+    hub = ConfigManager.config.hub
+    if hub["mode"] == "node":
+        if not hub.get("secret"): raise Exception("节点模式需要配置 hub.secret")
+        bot = HubClient(
+            server.logger,
+            hub["socket"] or default_socket_path(server.get_data_folder()),
+            hub["name"],
+            hub["secret"],
+            batch_interval=hub["batch_interval"],
+            max_pending=ConfigManager.config.telegram.get("max_pending") or 1000,
+            request_timeout=hub["request_timeout"]
+        )
+        bot.handlers["list"] = lambda: ConfigManager.roster.render()
+    else:
+        bot = TelegramBot(server.logger, ConfigManager.config.telegram["token"], **additional_args)
+    bot.action = action
+    bot.register()
+    return bot
+
+def backlog_key(config: Config) -> str:
+    """
+    update_id 只在同一个 Bot 内递增，以 Token 中的 Bot ID 区分
+    """
+    return str(config.telegram["token"] or "").split(":")[0]
+
+def create_backlog(server: PluginServerInterface) -> Backlog:
+    return Backlog(
+        os.path.join(server.get_data_folder(), "update_offset.json"),
+        server.say,
+        key=backlog_key(ConfigManager.config),
+        policy=ConfigManager.config.backlog["policy"],
+        max_age=ConfigManager.config.backlog["max_age"],
+        summary_lines=ConfigManager.config.backlog["summary_lines"]
+    )
+
+def connection_settings(config: Config) -> tuple:
+    """
+    创建 Bot 时使用的配置，热重载时只有这些配置变化才需要重建 Bot
+    """
+    telegram = config.telegram
+    return (telegram["token"], telegram["api"], telegram.get("webhook"), telegram.get("concurrent_updates"),
+            telegram.get("max_pending"), telegram.get("http"), config.hub)
+
+def configure_services(server: PluginServerInterface):
+    """
+    按配置（重新）启动指标导出与采样追踪
+    """
+    metrics.start_exporter(
+        os.path.join(server.get_data_folder(), "metrics.prom"),
+        ConfigManager.config.metrics["export_interval"]
+    )
+    tracer.configure(
+        os.path.join(server.get_data_folder(), "traces.jsonl"),
+        ConfigManager.config.tracing["sample_rate"],
+        ConfigManager.config.tracing["max_bytes"],
+        ConfigManager.config.tracing["backup_count"]
+    )
+
+def reload_config(server: PluginServerInterface) -> bool:
+    """
+    热重载配置、数据与命令树，保留正在运行的 Bot 与连接
+
+    在 Bot 的事件循环上同步执行，替换完成前不会处理其他消息；
+    返回连接配置是否有变化，有变化时需要再调用 restart_bot()
+    """
+    global command_tree
+    connection = connection_settings(ConfigManager.config)
+    tree = register_commands()
+    builtin = {regex for regex, _, _ in tree.commands}
+    for regex, types, func in command_tree.commands:
+        # 其他插件通过 command_tree.add_command() 注册的命令
+        if regex not in builtin: tree.add_command(regex, types, func)
+    ConfigManager.load_data(server)
+    command_tree = tree
+
+    outbound = ConfigManager.config.outbound
+    ConfigManager.outbound.configure(outbound["rate"], outbound["burst"], outbound["max_delay"])
+    ConfigManager.roster.sync_interval = ConfigManager.config.roster["sync_interval"]
+    ConfigManager.roster.dedup_window = ConfigManager.config.roster["dedup_window"]
+    backlog = ConfigManager.config.backlog
+    ConfigManager.backlog.policy = backlog["policy"]
+    ConfigManager.backlog.max_age = backlog["max_age"]
+    ConfigManager.backlog.summary_lines = backlog["summary_lines"]
+    configure_services(server)
+    register_gauges()
+    server.logger.info("已热重载配置与命令")
+    return connection_settings(ConfigManager.config) != connection
+
+def restart_bot(server: PluginServerInterface):
+    """
+    停止并按当前配置重建 Bot，会等待旧的事件循环线程退出，不能在其上调用
+    """
+    stop_hub()
+    flush_backlog()
+    close_outbound()
+    # 档案查询的 HTTP 客户端属于旧的事件循环，需要在其停止前关闭
+    ConfigManager.profiles.close()
+    ConfigManager.bot.stop()
+    if backlog_key(ConfigManager.config) != ConfigManager.backlog.key:
+        # 换了 Bot，旧 Bot 的 update_id 不再适用
+        ConfigManager.backlog.save()
+        ConfigManager.backlog = create_backlog(server)
+    ConfigManager.bot = create_bot(server)
+    ConfigManager.bot.start(bool(ConfigManager.config.telegram.get("wait_for_startup", False)))
+    if ConfigManager.config.hub["mode"] == "hub": start_hub(server)
+    register_gauges()
+    server.logger.info("Telegram 连接配置有变化，已重建 Bot")
 
 # MCDR 事件处理函数
 async def on_load(server: PluginServerInterface, old):
@@ -35,97 +278,177 @@ async def on_load(server: PluginServerInterface, old):
     插件加载操作
     """
     global command_tree
+    timings: list[tuple[str, float]] = [("导入", _import_seconds)]
+    checkpoint = time.perf_counter()
+
+    def mark(stage: str):
+        nonlocal checkpoint
+        now = time.perf_counter()
+        timings.append((stage, now - checkpoint))
+        checkpoint = now
+
     command_tree = register_commands()
+    mark("注册命令")
     
     ConfigManager.load_data(server)
+    mark("加载配置与数据")
     
     ConfigManager.online_player_api = server.get_plugin_instance("online_player_api")
     if ConfigManager.online_player_api is None: raise Exception("Unable to load dependency \"online_player_api\"")
+    ConfigManager.roster = Roster(
+        ConfigManager.online_player_api.get_player_list,
+        sync_interval=ConfigManager.config.roster["sync_interval"],
+        dedup_window=ConfigManager.config.roster["dedup_window"]
+    )
     
-    async def action(event: Update, context: ContextTypes.DEFAULT_TYPE):
-        await on_message(server, event, context)
-
-    additional_args = {
-        "api": ConfigManager.config.telegram["api"],
-        "timeout": ConfigManager.config.telegram["startup_timeout"]
-    }
-    additional_args = {k: v for k, v in additional_args.items() if v is not None} # 过滤掉值为 None 的项
-
-    ConfigManager.bot = TelegramBot(server.logger, ConfigManager.config.telegram["token"], **additional_args)
-    ConfigManager.bot.action = action
-    ConfigManager.bot.register()
-    ConfigManager.bot.start(True)
+    ConfigManager.backlog = create_backlog(server)
+    ConfigManager.bot = create_bot(server)
+    mark("创建 Bot")
+    # 默认在后台连接，连接完成前的发送会排队等待
+    wait = bool(ConfigManager.config.telegram.get("wait_for_startup", False))
+    ConfigManager.bot.start(wait)
+    mark("连接 Telegram" if wait else "启动 Bot 线程")
     
     ConfigManager.logger = server.logger
+    ConfigManager.outbound = OutboundQueue(
+        tools.send_message,
+        server.logger,
+        rate=ConfigManager.config.outbound["rate"],
+        burst=ConfigManager.config.outbound["burst"],
+        max_delay=ConfigManager.config.outbound["max_delay"]
+    )
+    if ConfigManager.config.hub["mode"] == "hub": start_hub(server)
     
 
+    register_gauges()
+    configure_services(server)
+
+    mark("初始化队列与指标")
+
     server.register_help_message("!!tg", "向 Telegram 群聊发送聊天信息")
     server.register_command(
         Literal("!!tg").then(GreedyText("message").runs(mc_command_tg))
     )
     
     
+    total = sum(seconds for _, seconds in timings)
+    server.logger.info(
+        f"启动耗时 {total * 1000:.0f}ms：" + "，".join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in timings)
+        + ("" if wait else "；Telegram 连接在后台进行")
+    )
+    
     if old is not None and old.VERSION < VERSION:
         tip: str = f"TelegramChat 已从 ver.{old.const.VERSION_STR} 更新到 ver.{VERSION_STR}"
         # await tools.send_to_group(tip)
         server.say(f"§7{tip}")
 
-def on_unload(server: PluginServerInterface): ConfigManager.bot.stop() if ConfigManager.bot is not None else None
+def on_unload(server: PluginServerInterface):
+    metrics.stop_exporter()
+    tracer.close()
+    stop_hub()
+    flush_backlog()
+    close_outbound()
+    ConfigManager.close()
+    if ConfigManager.bot is not None: ConfigManager.bot.stop()
 
-async def on_user_info(server: PluginServerInterface, info: Info):
+def on_user_info(server: PluginServerInterface, info: Info):
     if ConfigManager.config.forwardings["mc_to_tg"] is True and info.player:
-        await tools.send_to_group(f"{info.player}:\n{info.content}", entities=[MessageEntity("bold", 0, len(info.player) + 1)])
+        tools.submit(tools.send_to_group(f"{info.player}:\n{info.content}", entities=[MessageEntity("bold", 0, len(info.player) + 1)]))
 
-async def on_player_joined(server: PluginServerInterface, player: str, info: Info):
+def on_player_joined(server: PluginServerInterface, player: str, info: Info):
+    ConfigManager.roster.join(player)
     message = f"{player} 加入了游戏。"
-    await tools.send_to_group(message, entities=[MessageEntity("italic", 0, len(message)), MessageEntity("bold", 0, len(player))])
+    tools.submit(tools.send_to_group(message, "join", entities=[MessageEntity("italic", 0, len(message)), MessageEntity("bold", 0, len(player))]))
 
-async def on_player_left(server: PluginServerInterface, player: str):
+def on_player_left(server: PluginServerInterface, player: str):
+    ConfigManager.roster.leave(player)
     message = f"{player} 离开了游戏。"
-    await tools.send_to_group(message, entities=[MessageEntity("italic", 0, len(message)), MessageEntity("bold", 0, len(player))])
+    tools.submit(tools.send_to_group(message, "leave", entities=[MessageEntity("italic", 0, len(message)), MessageEntity("bold", 0, len(player))]))
+
+def on_server_stop(server: PluginServerInterface, server_return_code: int):
+    ConfigManager.roster.clear()
 
 async def on_message(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE):
     if event.message is None: return
     content = event.message.text
     if content is None: return
-    event_type = tools.parse_event_type(event)
-    ConfigManager.logger.debug(f"Update 数据：\n{event}")
-    
-    typ = tools.get_type(event)
-    # 防止自己的机器人被别人拉去用还越权
-    match (typ):
-        case ChatType.PRIVATE:
-            if str(tools.get_id(event)) not in ConfigManager.config.admins: return
-        case ChatType.GROUP:
-            if str(tools.get_id(event)) not in ConfigManager.config.admins and event.message.chat.id != ConfigManager.config.group: return
-        case _:
+    verdict = ConfigManager.backlog.admit(event.update_id, event.message.date.timestamp(), content.startswith('/'))
+    if verdict != PROCESS:
+        metrics.inc("telegram_chat_backlog_updates_total", result=verdict)
+        if verdict != SUMMARIZE: return
+    token = tracer.begin(update_id=event.update_id, chat_id=event.message.chat.id)
+    try:
+        await handle_message(server, event, context, content, verdict == SUMMARIZE)
+    finally:
+        tracer.finish(token)
+
+async def handle_message(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE, content: str,
+                         summarize: bool = False):
+    """
+    处理一条文本消息，各阶段的耗时会记录到采样追踪中
+
+    summarize 为 True 时这是一条积压的聊天消息，只计入摘要
+    """
+    message = event.message
+    assert message is not None
+    with span("receive"):
+        request = Request(server, event, context)
+        lag = max(time.time() - message.date.timestamp(), 0)
+        metrics.observe("telegram_chat_update_lag_seconds", lag)
+        annotate(lag_ms=round(lag * 1000), command=content.split(' ', 1)[0] if content.startswith('/') else None)
+        server.logger.debug("Update 数据：\n%s", event)
+
+    with span("auth"):
+        # 防止自己的机器人被别人拉去用还越权
+        if not request.can_reach():
+            metrics.inc("telegram_chat_permission_denied_total", permission="access", role=request.role)
             return
-    
+
     # 普通信息
-    if ConfigManager.config.forwardings["tg_to_mc"] is True and typ == ChatType.GROUP:
-        id: str = str(tools.get_id(event))
-        name: str = f"§a<{ConfigManager.bindings[id]}>§7" if id in ConfigManager.bindings else f"§4<{event.message.chat.full_name} ({id})>§7"
-        server.say(f"§7[TG] {name}: {content}")
-
-    # 封禁列表，不作应答
-    if tools.get_id(event) in ConfigManager.ban_list:
-        server.logger.debug(f"用户 {tools.get_id(event)} 已被封禁，拒绝处理其请求")
-        return
-        
-    server.logger.debug(f"正在处理用户 {tools.get_id(event)} 的请求……")
-    server.logger.debug(f"用户请求执行命令：{content}")
-    await execute_bot_command(server, event, context, content, event_type)
+    if ConfigManager.config.forwardings["tg_to_mc"] is True and request.can("chat"):
+        with span("forward"):
+            player = request.player
+            name: str = f"§a<{player}>§7" if player is not None else f"§4<{message.chat.full_name} ({request.user_id})>§7"
+            line = f"§7[TG] {name}: {content}"
+            if summarize: ConfigManager.backlog.summarize(line)
+            else: server.say(line)
+    if summarize: return
+    # Hub 模式：群聊消息也交给各个节点转发到各自的服务器
+    if ConfigManager.hub is not None and ConfigManager.hub.nodes and not content.startswith('/'):
+        await ConfigManager.hub.broadcast(event)
+
+    with span("auth"):
+        # 封禁列表，不作应答
+        if request.is_banned:
+            server.logger.debug("用户 %s 已被封禁，拒绝处理其请求", request.user_id)
+            return
+
+        # 限流
+        if content.startswith('/') and ConfigManager.throttle is not None:
+            delay = ConfigManager.throttle.reserve(request.user_id, request.chat_id, content.split(' ', 1)[0], request.is_admin)
+            if delay is None:
+                server.logger.debug("用户 %s 的请求过于频繁，已忽略", request.user_id)
+                return
+            if delay > 0: await asyncio.sleep(delay)
+
+    if await route_to_node(event, content): return
+    if ConfigManager.hub is not None:
+        command, target = split_target(content)
+        if target == ConfigManager.hub.name: content = command
+    server.logger.debug("正在处理用户 %s 的请求：%s", request.user_id, content)
+    await execute_bot_command(request, content)
 
 # MC 命令处理器
-async def mc_command_tg(src: CommandSource, ctx: CommandContext):
+def mc_command_tg(src: CommandSource, ctx: CommandContext):
     player = "Console"
     if src.is_player:
         player = src.player # type: ignore
-        if player not in ConfigManager.bindings.values():
+        ids = ConfigManager.bindings.ids_of(player)
+        if not ids:
             src.reply("请先在群内绑定你的账号！")
             return
-        elif (not str(next((key for key, value in ConfigManager.bindings.items() if value == player), 0)) in ConfigManager.config.admins and not src.has_permission(2)) and (player != "Console"):
+        elif not src.has_permission(2) and not any(ConfigManager.permissions.check(id, GAME, "tg") for id in ids):
             src.reply("你没有足够的权限！")
             return
     msg = f"{player}:\n{ctx['message']}"
-    await tools.send_to_group(msg, entities=[MessageEntity("bold", 0, len(player) + 1)])
\ No newline at end of file
+    tools.submit(tools.send_to_group(msg, "tg", entities=[MessageEntity("bold", 0, len(player) + 1)]))
\ No newline at end of file
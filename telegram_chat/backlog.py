@@ -0,0 +1,117 @@
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Callable
+
+# 启动时积压消息的处理策略
+DROP = "drop"
+COMMANDS = "commands"
+SUMMARY = "summary"
+POLICIES = (DROP, COMMANDS, SUMMARY)
+
+# admit() 的结果
+PROCESS = "process"
+DUPLICATE = "duplicate"
+EXPIRED = "expired"
+DROPPED = "dropped"
+SUMMARIZE = "summarize"
+
+class Backlog:
+    """
+    插件加载前发出、停机期间积压的 Update 的处理策略
+
+    drop 全部丢弃；commands 只执行命令；summary 丢弃命令，聊天消息合并为一条摘要转发到游戏内。
+    早于 max_age 秒的消息无论是否积压都会丢弃；已处理的最大 update_id 与最新的消息时间按 key（Bot 的 ID）保存在 path 中，
+    重启后 Telegram 重新推送的已处理 Update（ID 与时间都不超过保存的值）会被跳过。
+    Bot 一周没有收到 Update 后 Telegram 会随机选择新的起始 update_id，可能小于保存的值，
+    此时按时间识别出新消息，并改为记录新的 update_id
+    """
+    def __init__(self, path: str, say: Callable[[str], None], key: str = "", policy: str = COMMANDS, max_age: float = 300,
+                 summary_lines: int = 5, save_interval: float = 5):
+        self.path = path
+        self.key = key
+        self.say = say
+        self.policy = policy if policy in POLICIES else COMMANDS
+        self.max_age = max_age
+        self.summary_lines = summary_lines
+        self.save_interval = save_interval
+        # message.date 只精确到秒，同一秒内的消息视为新消息
+        self.started_at = math.floor(time.time())
+        self.last_update_id, self.last_date = self._load()
+        self._processed_before = self.last_update_id
+        self._processed_date = self.last_date
+        self._saved_id = self.last_update_id
+        self._saved_at = time.monotonic()
+        self._summary: list[str] = []
+        self._summary_count = 0
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    def _load(self) -> tuple[int, float]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            # 更换 Bot 后 update_id 不再连续
+            if data.get("key") != self.key: return 0, 0
+            # 旧版本没有保存时间，以文件的修改时间代替
+            date = data.get("date")
+            return int(data["update_id"]), float(date) if date is not None else os.path.getmtime(self.path)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return 0, 0
+
+    def save(self):
+        """
+        保存已处理的最大 update_id，没有变化时不写入
+        """
+        self._saved_at = time.monotonic()
+        if self.last_update_id == self._saved_id: return
+        temp = self.path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({"key": self.key, "update_id": self.last_update_id, "date": self.last_date}, f)
+        os.replace(temp, self.path)
+        self._saved_id = self.last_update_id
+
+    def admit(self, update_id: int, date: float, is_command: bool) -> str:
+        """
+        判断一条 Update 如何处理，date 为 message.date 的时间戳
+        """
+        if update_id <= self._processed_before and date <= self._processed_date: return DUPLICATE
+        if update_id > self.last_update_id or (update_id <= self._processed_before and date > self.last_date):
+            # 后一种情况是 Telegram 重新选择了更小的 update_id
+            self.last_update_id = update_id
+        if date > self.last_date: self.last_date = date
+        if self.last_update_id != self._saved_id and time.monotonic() - self._saved_at >= self.save_interval: self.save()
+
+        if self.max_age > 0 and time.time() - date > self.max_age: return EXPIRED
+        if date >= self.started_at: return PROCESS
+        match self.policy:
+            case "commands":
+                return PROCESS if is_command else DROPPED
+            case "summary":
+                return DROPPED if is_command else SUMMARIZE
+            case _:
+                return DROPPED
+
+    def summarize(self, line: str, delay: float = 1.0):
+        """
+        收集一条积压的聊天消息，delay 秒内没有新的积压消息时转发摘要；需要在事件循环中调用
+        """
+        self._summary.append(line)
+        del self._summary[:-self.summary_lines]
+        self._summary_count += 1
+        if self._flush_handle is not None: self._flush_handle.cancel()
+        self._flush_handle = asyncio.get_running_loop().call_later(delay, self.flush)
+
+    def flush(self):
+        """
+        立即转发收集到的摘要；需要在事件循环中调用
+        """
+        if self._flush_handle is not None: self._flush_handle.cancel()
+        self._flush_handle = None
+        if not self._summary_count: return
+        omitted = self._summary_count - len(self._summary)
+        self.say(f"§7[TG] 离线期间群聊中有 {self._summary_count} 条消息" + (f"，以下为最近 {len(self._summary)} 条：" if omitted else "："))
+        for line in self._summary: self.say(line)
+        self._summary.clear()
+        self._summary_count = 0
@@ -0,0 +1,90 @@
+import logging
+from typing import Iterator
+
+class BindingStore:
+    """
+    Telegram 账号与 Minecraft 玩家的双向绑定表
+
+    Telegram ID 以 int 保存，玩家名按小写建立反向索引，两个方向的查询都是 O(1)
+    """
+    __slots__ = ("_by_id", "_by_player")
+
+    def __init__(self):
+        self._by_id: dict[int, str] = {}
+        self._by_player: dict[str, set[int]] = {}
+
+    @staticmethod
+    def _key(id: int | str) -> int | None:
+        try:
+            return int(id)
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, str], logger: logging.Logger | None = None) -> "BindingStore":
+        """
+        从 {Telegram ID: 玩家名} 构建，跳过不是整数的 ID
+        """
+        store = cls()
+        for id, player in data.items():
+            if cls._key(id) is None:
+                if logger is not None: logger.warning(f"忽略 Telegram ID 无效的绑定：{id!r} -> {player}")
+                continue
+            store.bind(id, player)
+        return store
+
+    def to_dict(self) -> dict[str, str]:
+        return {str(id): player for id, player in self._by_id.items()}
+
+    def get(self, id: int | str) -> str | None:
+        """
+        查询 Telegram 账号绑定的玩家
+        """
+        key = self._key(id)
+        return None if key is None else self._by_id.get(key)
+
+    def ids_of(self, player: str) -> list[int]:
+        """
+        查询绑定到某个玩家（不区分大小写）的所有 Telegram 账号
+        """
+        return sorted(self._by_player.get(player.lower(), ()))
+
+    def has_player(self, player: str) -> bool:
+        return player.lower() in self._by_player
+
+    def bind(self, id: int | str, player: str) -> str | None:
+        """
+        绑定账号，返回被覆盖的旧玩家名
+        """
+        key = self._key(id)
+        if key is None: raise ValueError(f"Invalid Telegram ID: {id}")
+        old = self.unbind(key)
+        self._by_id[key] = player
+        self._by_player.setdefault(player.lower(), set()).add(key)
+        return old
+
+    def unbind(self, id: int | str) -> str | None:
+        """
+        解除绑定，返回原先绑定的玩家名
+        """
+        key = self._key(id)
+        if key is None: return None
+        player = self._by_id.pop(key, None)
+        if player is not None:
+            ids = self._by_player[player.lower()]
+            ids.discard(key)
+            if not ids: del self._by_player[player.lower()]
+        return player
+
+    def items(self) -> Iterator[tuple[int, str]]:
+        return iter(self._by_id.items())
+
+    def __contains__(self, id: object) -> bool:
+        key = self._key(id) # type: ignore
+        return key is not None and key in self._by_id
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __repr__(self) -> str:
+        return f"<BindingStore bindings: {len(self._by_id)}>"
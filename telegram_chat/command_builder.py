@@ -1,20 +1,30 @@
 import re
 from typing import Any, Callable
 
+# 正则中会改变匹配含义的字符，字面量前缀在遇到它们时结束
+_REGEX_SPECIAL = set(".^$*+?{}[]\\|()")
+
 class CommandBuilder:
     def __init__(self):
         self.commands: list[tuple[re.Pattern | str, list[type] | None, Callable]] = []
+        # 惰性构建的分发索引，命令表变更后置为 None
+        self._exact: dict[str, tuple[list[type] | None, Callable]] | None = None
+        self._by_token: dict[str, list[int]] = {}
+        self._fallback: list[int] = []
+        self._indexed_size: int = 0
 
     def add_command(self, regex: re.Pattern | str, types: list[type] | None, func: Callable) -> bool:
         if not len([e for e in self.commands if e[0] == regex]):
             self.commands.append((regex, types, func))
+            self._invalidate()
             return True
         return False
     
     def remove_command(self, regex: re.Pattern | str) -> bool:
         commands = [c for c in self.commands if c[0] != regex]
-        result = commands == self.commands
+        result = len(commands) != len(self.commands)
         self.commands = commands
+        self._invalidate()
         return result
 
     async def handle(self, command: str) -> tuple[bool, Any | None]:
@@ -27,23 +37,82 @@ class CommandBuilder:
         return await func(*args)
     
     def get(self, command: str) -> tuple[Callable | None, Any]:
-        for regex, types, func in self.commands:
+        """
+        查找命令对应的处理器
+
+        完全一致的字符串命令优先，其余按首个词筛选候选正则后按注册顺序尝试
+        """
+        _, func, args = self.match(command)
+        return (func, args)
+
+    def match(self, command: str) -> tuple[str | None, Callable | None, Any]:
+        """
+        与 get() 相同，额外返回命中的路由（注册时的字符串或正则表达式）
+        """
+        self._ensure_index()
+        exact = self._exact.get(command) # type: ignore
+        if exact is not None:
+            return (command, exact[1], [])
+
+        token = command.split(' ', 1)[0]
+        for i in self._candidates(token):
+            regex, types, func = self.commands[i]
             try:
-                if isinstance(regex, re.Pattern):
-                    match = regex.match(command)
-                    if match is not None:
-                        args = self.type_check(match.groups(), types)
-                        return (func, args)
-                    else: continue
-                elif isinstance(regex, str) and regex == command:
-                    return (func, [])
+                match = regex.match(command) # type: ignore
+                if match is not None:
+                    return (regex.pattern, func, self.type_check(match.groups(), types)) # type: ignore
             except ValueError: ...
-        return (None, [])
+        return (None, None, [])
     
     def __repr__(self) -> str:
         command_count = len(self.commands)
         return f"<CommandBuilder commands: {command_count} command{'s' if command_count == 1 else ''}>"
 
+    def _invalidate(self):
+        self._exact = None
+
+    def _candidates(self, token: str) -> list[int]:
+        bucket = self._by_token.get(token)
+        if bucket is None: return self._fallback
+        if not self._fallback: return bucket
+        return sorted(bucket + self._fallback)
+
+    def _ensure_index(self):
+        """
+        按需重建分发索引
+        """
+        if self._exact is not None and self._indexed_size == len(self.commands): return
+
+        exact: dict[str, tuple[list[type] | None, Callable]] = {}
+        by_token: dict[str, list[int]] = {}
+        fallback: list[int] = []
+        for i, (regex, types, func) in enumerate(self.commands):
+            if isinstance(regex, str):
+                exact.setdefault(regex, (types, func))
+                continue
+            token = self._first_token(regex)
+            if token is None: fallback.append(i)
+            else: by_token.setdefault(token, []).append(i)
+
+        self._exact, self._by_token, self._fallback = exact, by_token, fallback
+        self._indexed_size = len(self.commands)
+
+    @staticmethod
+    def _first_token(regex: re.Pattern) -> str | None:
+        """
+        提取正则的首个词（以空格结尾的字面量前缀），无法确定时返回 None
+        """
+        if regex.flags & re.IGNORECASE or not isinstance(regex.pattern, str): return None
+        pattern = regex.pattern
+        for i, char in enumerate(pattern):
+            if char == ' ':
+                # 空格本身可省略时无法按词切分
+                if pattern[i + 1:i + 2] in ("?", "*", "{"): return None
+                return pattern[:i] or None
+            if char in _REGEX_SPECIAL:
+                return None
+        return None
+
     @staticmethod
     def type_check(input_list: tuple[Any, ...], target_types: list[type] | None) -> list[Any]:
         if target_types is None:
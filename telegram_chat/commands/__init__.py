@@ -1,22 +1,40 @@
 import re
 from enum import Enum
 
-from .. import const, tools
+from .. import const
 from ..command_builder import CommandBuilder
+from ..permissions import requires
+from ..request import Request
 from . import bind, game, other, user, whitelist
-from .types import MessageType
-from ..config import ConfigManager
 
 # 实用函数
 def register_commands():
     """
     注册命令树
     """
-    def run_command(command, need_admin: bool = False):
-        async def _run(server, event, context, _, type):
-            if not need_admin or type == MessageType.ADMIN:
-                await tools.execute(server, event, context, command)
+    def run_command(command: str, permission: str):
+        @requires(permission)
+        async def _run(request: Request, _):
+            await request.execute(command)
         return _run
+
+    def reply(message: str, permission: str):
+        @requires(permission)
+        async def _reply(request: Request, _):
+            await request.reply(message)
+        return _reply
+
+    @requires("server")
+    async def start(request: Request, _):
+        request.server.start()
+
+    @requires("server")
+    async def stop(request: Request, _):
+        request.server.stop()
+
+    @requires("server")
+    async def restart(request: Request, _):
+        request.server.restart()
     
     command_tree = CommandBuilder()
     # /mc
@@ -26,18 +44,18 @@ def register_commands():
     command_tree.add_command("/list", None, game.list)
 
     #/bind
-    command_tree.add_command("/bind", None, lambda srv, evt, ctx, cmd, typ: tools.send_to(evt, ctx, const.Help.bind))
+    command_tree.add_command("/bind", None, reply(const.Help.bind, "bind"))
     command_tree.add_command(re.compile(r'/bind unbind (\d*)'), [str], bind.bind_unbind)
     command_tree.add_command(re.compile(r'/bind query (TG|ID) (\w*)'), [str, str], bind.bind_query)
     command_tree.add_command(re.compile(r'/bind (\d*) (\w*)'), [str, str], bind.bind_admin)
     command_tree.add_command(re.compile(r'/bind (\w*)'), [str], bind.bind_user)
 
     # /whitelist
-    command_tree.add_command("/whitelist", None, lambda srv, evt, ctx, cmd, typ: tools.send_to(evt, ctx, const.Help.whitelist))
-    command_tree.add_command("/whitelist list", None, run_command("whitelist list", True))
-    command_tree.add_command("/whitelist reload", None, run_command("whitelist reload", True))
-    command_tree.add_command("/whitelist on", None, run_command("whitelist on", True))
-    command_tree.add_command("/whitelist off", None, run_command("whitelist off", True))
+    command_tree.add_command("/whitelist", None, reply(const.Help.whitelist, "whitelist"))
+    command_tree.add_command("/whitelist list", None, run_command("whitelist list", "whitelist.manage"))
+    command_tree.add_command("/whitelist reload", None, run_command("whitelist reload", "whitelist.manage"))
+    command_tree.add_command("/whitelist on", None, run_command("whitelist on", "whitelist.manage"))
+    command_tree.add_command("/whitelist off", None, run_command("whitelist off", "whitelist.manage"))
     command_tree.add_command(re.compile(r'/whitelist add (\w*)'), [str], whitelist.whitelist_add)
     command_tree.add_command(re.compile(r'/whitelist remove (\w*)'), [str], whitelist.whitelist_remove)
 
@@ -51,15 +69,17 @@ def register_commands():
     command_tree.add_command("/ping", None, other.ping)
     
     # /start /stop /restart 
-    command_tree.add_command("/start", None, lambda srv, evt, ctx, cmd, typ: srv.start() if typ == MessageType.ADMIN else None)
-    command_tree.add_command("/stop", None, lambda srv, evt, ctx, cmd, typ: srv.stop() if typ == MessageType.ADMIN else None)
-    command_tree.add_command("/restart", None, lambda srv, evt, ctx, cmd, typ: srv.restart() if typ == MessageType.ADMIN else None)
+    command_tree.add_command("/start", None, start)
+    command_tree.add_command("/stop", None, stop)
+    command_tree.add_command("/restart", None, restart)
     
     # /info
     command_tree.add_command("/info", None, other.info)
+    command_tree.add_command(re.compile(r'/info (\d+)'), [int], other.info)
     
     # /reload
     command_tree.add_command("/reload", None, other.reload)
+    command_tree.add_command("/reload plugin", None, other.reload_plugin)
     
     # /ban /pardon
     command_tree.add_command(re.compile(r'/ban (\d*)'), [int], user.ban)
@@ -72,4 +92,10 @@ def register_commands():
     # /save
     command_tree.add_command("/save", None, other.save)
     
+    # /export
+    command_tree.add_command("/export", None, other.export)
+    
+    # /stats
+    command_tree.add_command("/stats", None, other.stats)
+    
     return command_tree
\ No newline at end of file
@@ -1,41 +1,32 @@
 from typing import List
 
-from mcdreforged.api.types import PluginServerInterface
-
-from telegram import Update
-from telegram.ext import ContextTypes
-
-from .. import tools
 from ..config import ConfigManager
-from .types import MessageType
-
-async def command(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE, command: List[str],
-                    event_type: MessageType):
-    cmd = command[0]
-    if event_type == MessageType.ADMIN:
-        await tools.execute(server, event, context, cmd)
-
-async def list(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE, *args):
-    players = ConfigManager.online_player_api.get_player_list()
-
-    count = len(players)
-    message = f"服务器目前有 {count} 个玩家在线~"
-    if count:
-        message += f"\n=== 玩家列表 ===\n"
-        for player in players: message += f"{player}\n"
-
-    await tools.send_to(event, context, message)
-
-async def mc(
-        server: PluginServerInterface,
-        event: Update,
-        context: ContextTypes.DEFAULT_TYPE,
-        command: List[str],
-        event_type: MessageType
-):
-
-    id = str(tools.get_id(event))
-    if id in ConfigManager.bindings.keys() and id in ConfigManager.config.admins:
-        server.say(f"§2[TG] §a<{ConfigManager.bindings[id]}>§7 {command[0]}")
+from ..permissions import requires
+from ..request import Request
+
+@requires("command")
+async def command(request: Request, command: List[str]):
+    await request.execute(command[0])
+
+@requires("list")
+async def list(request: Request, *args):
+    if not ConfigManager.roster.should_reply(request.chat_id): return
+    message = ConfigManager.roster.render()
+    hub = ConfigManager.hub
+    if hub is not None and hub.nodes:
+        # Hub 模式：合并全部服务器的在线玩家
+        results = await hub.call_all("list")
+        sections = [(hub.name, message)] + sorted(results.items())
+        message = "\n\n".join(f"[{name}]\n{str(text).rstrip()}" for name, text in sections)
+
+    await request.reply(message)
+
+@requires("mc")
+async def mc(request: Request, command: List[str]):
+    player = request.player
+    if player is None:
+        await request.reply("请先绑定你的账号！")
+    elif request.is_admin:
+        request.server.say(f"§2[TG] §a<{player}>§7 {command[0]}")
     else:
-        server.say(f"§7[TG] §a<{ConfigManager.bindings[id]}>§7 {command[0]}")
\ No newline at end of file
+        request.server.say(f"§7[TG] §a<{player}>§7 {command[0]}")
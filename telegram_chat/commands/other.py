@@ -1,55 +1,62 @@
+import threading
 import time
 from typing import List
 
-from mcdreforged.api.types import PluginServerInterface
-
-from telegram import Update
-from telegram.ext import ContextTypes
-
-from .. import tools
 from ..const import Help
 from ..info import get_system_info
-from .types import ChatType, MessageType
+from ..metrics import metrics
 from ..config import ConfigManager
+from ..permissions import requires
+from ..request import Request
+
+@requires("help")
+async def help(request: Request, command):
+    await request.reply(Help.admin) if request.is_admin else await request.reply(Help.user)
+
+@requires("info")
+async def info(request: Request, command: List[int]):
+    minutes = command[0] if command else ConfigManager.config.system_monitor["window_minutes"]
+    await request.reply(get_system_info(ConfigManager.sampler, minutes))
+
+@requires("ping")
+async def ping(request: Request, command: List[str]):
+    message = request.event.message
+    if message is None: raise Exception("event.message is none")
+    delay = max((time.time() - message.date.timestamp()) * 1000, 0)
+    await request.reply(f"Pong！服务在线，延迟 {delay:.2f}ms。")
 
-async def help(server, event, context, command, type):
-    await tools.send_to(event, context, Help.admin) if type == MessageType.ADMIN else await tools.send_to(event, context, Help.user)
-
-async def info(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE, command: List[str],
-                    event_type: MessageType):
-    if event_type == MessageType.ADMIN and event.message and tools.get_type(event) == ChatType.PRIVATE:
-        await tools.send_to(
-            event,
-            context,
-            get_system_info()
-        )
-
-async def ping(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE, command: List[str],
-                    event_type: MessageType):
-    if event.message is None: raise Exception("event.message is none")
-    delay = max((time.time() - event.message.date.timestamp()) * 1000, 0)
-    await tools.send_to(
-        event,
-        context,
-        f"Pong！服务在线，延迟 {delay:.2f}ms。"
-    )
-
-async def reload(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE, command: List[str],
-                      event_type: MessageType):
-    if event_type == MessageType.ADMIN:
-        await tools.send_to(
-            event,
-            context,
-            f"收到，正在重载……"
-        )
-        server.reload_plugin("telegram_chat")
+@requires("reload")
+async def reload(request: Request, command: List[str]):
+    from .. import reload_config, restart_bot # 避免循环导入
+    try:
+        changed = reload_config(request.server)
+    except Exception as e:
+        await request.reply(f"重载失败：{e}")
+        return
+    if not changed:
+        await request.reply("已重载配置与命令。")
+        return
+    await request.reply("已重载配置与命令，Telegram 连接配置有变化，正在重启 Bot……")
+    # 重启需要等待当前的事件循环退出，交给独立线程进行
+    threading.Thread(target=restart_bot, args=(request.server,), name="TelegramChat-Reload", daemon=True).start()
+
+@requires("reload")
+async def reload_plugin(request: Request, command: List[str]):
+    await request.reply(f"收到，正在重新加载插件……")
+    # 卸载时需要在事件循环上完成收尾并等待其退出，不能在事件循环上同步执行
+    threading.Thread(target=request.server.reload_plugin, args=("telegram_chat",), name="TelegramChat-Reload", daemon=True).start()
         
-async def save(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE, command: List[str],
-                      event_type: MessageType):
-    if event_type == MessageType.ADMIN:
-        await tools.send_to(
-            event,
-            context,
-            f"收到，正在保存……"
-        )
-        ConfigManager.save_data(server)
\ No newline at end of file
+@requires("save")
+async def save(request: Request, command: List[str]):
+    await request.reply(f"收到，正在保存……")
+    ConfigManager.save_data(request.server)
+
+@requires("export")
+async def export(request: Request, command: List[str]):
+    ConfigManager.export_data(request.server)
+    await request.reply(f"已导出绑定数据与封禁列表到 {request.server.get_data_folder()}")
+
+
+@requires("stats")
+async def stats(request: Request, command: List[str]):
+    await request.reply(metrics.summary())
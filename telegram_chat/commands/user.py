@@ -1,40 +1,25 @@
 from typing import List
 
-from mcdreforged.api.types import PluginServerInterface
+from ..config import ConfigManager
+from ..permissions import requires
+from ..request import Request
 
-from telegram import Update
-from telegram.ext import ContextTypes
-
-from .. import tools
-from ..config import ConfigManager, Config
-from .types import MessageType
-
-async def bot_ban(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE, command: List[str],
-                       event_type: MessageType):
+@requires("bot-ban")
+async def bot_ban(request: Request, command: List[int]):
     id = command[0]
-    if id not in ConfigManager.ban_list and event_type == MessageType.ADMIN:
-        ConfigManager.ban_list.append(int(id))
-        await tools.send_to(
-            event,
-            context,
-            f"成功封禁 Telegram 账号: {id}"
-        )
-        ConfigManager.save_data(server)
+    if ConfigManager.ban_user(id):
+        await request.reply(f"成功封禁 Telegram 账号: {id}")
 
-async def bot_pardon(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE, command: List[str],
-                          event_type: MessageType):
+@requires("bot-ban")
+async def bot_pardon(request: Request, command: List[int]):
     id = command[0]
-    if id in ConfigManager.ban_list and event_type == MessageType.ADMIN:
-        ConfigManager.ban_list.remove(id)
-        await tools.send_to(
-            event,
-            context,
-            f"成功解封 Telegram 账号: {id}"
-        )
-        ConfigManager.save_data(server)
+    if ConfigManager.pardon_user(id):
+        await request.reply(f"成功解封 Telegram 账号: {id}")
         
-def ban(server, event, context, command, event_type):
-    tools.execute(server, event, context, f"ban {command[0]}") if event_type == MessageType.ADMIN else None
+@requires("ban")
+async def ban(request: Request, command: List[int]):
+    await request.execute(f"ban {command[0]}")
 
-def pardon(server, event, context, command, event_type):
-    tools.execute(server, event, context, f"pardon {command[0]}") if event_type == MessageType.ADMIN else None
\ No newline at end of file
+@requires("ban")
+async def pardon(request: Request, command: List[int]):
+    await request.execute(f"pardon {command[0]}")
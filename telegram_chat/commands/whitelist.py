@@ -1,19 +1,13 @@
 from typing import List
 
-from mcdreforged.api.types import PluginServerInterface
-
-from telegram import Update
-from telegram.ext import ContextTypes
-
 from .. import tools
-from .types import MessageType
+from ..permissions import requires
+from ..request import Request
 
-async def whitelist_add(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE, command: List[str],
-                             event_type: MessageType):
-    if event_type == MessageType.ADMIN:
-        await tools.add_to_whitelist(server, event, context, command[0])
+@requires("whitelist.manage")
+async def whitelist_add(request: Request, command: List[str]):
+    await tools.add_to_whitelist(request.server, request.event, request.context, command[0])
 
-async def whitelist_remove(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE, command: List[str],
-                             event_type: MessageType):
-    if event_type == MessageType.ADMIN:
-        await tools.remove_from_whitelist(server, event, context, command[0])
+@requires("whitelist.manage")
+async def whitelist_remove(request: Request, command: List[str]):
+    await tools.remove_from_whitelist(request.server, request.event, request.context, command[0])
@@ -1,9 +1,22 @@
 from mcdreforged.api.utils import Serializable
 from typing import Any, Dict, List
 import logging
+from .backlog import Backlog
+from .bindings import BindingStore
+from .info import SystemSampler
+from .outbound import OutboundQueue
+from .permissions import PermissionTable
+from .hub import HubClient, HubServer
+from .profile import MOJANG_PROFILE_API, ProfileResolver
+from .rcon import RconExecutor
+from .roster import Roster
+from .throttle import Throttle
+from .storage import Storage, create_storage, save_json
 from .telegram_manager import TelegramBot
 from mcdreforged.api.types import PluginServerInterface
 
+BROADCAST_EVENTS = ("chat", "join", "leave", "tg")
+
 class Config(Serializable):
     admins: List[str] = []
     group: int = 0
@@ -17,49 +30,369 @@ class Config(Serializable):
         "token": None,
         "api": None,
         "startup_timeout": 60,
+        # 为 true 时插件加载会等待连接完成（最多 startup_timeout 秒），连接失败则加载失败；
+        # 否则在后台连接，失败时按 1、2、4…… 秒（最多 300 秒）的间隔重试，期间的发送会在控制台报错
+        "wait_for_startup": False,
+        "max_pending": 1000,
+        # 同时处理的 Update 数量，同一聊天、同一用户的 Update 仍按顺序处理；1 表示逐条处理
+        "concurrent_updates": 8,
+        # Bot API 的 HTTP 连接：pool_size 为发送等调用共用的连接数，get_updates_pool_size 为长轮询单独使用的连接数；
+        # 超时单位为秒，pool_timeout 为等待空闲连接的最长时间；keepalive_connections 个空闲连接
+        # 最多保持 keepalive_expiry 秒；http2 需要安装 python-telegram-bot[http2]，不可用时回退到 HTTP/1.1
+        "http": {
+            "pool_size": 64,
+            "get_updates_pool_size": 1,
+            "connect_timeout": 5,
+            "read_timeout": 5,
+            "write_timeout": 5,
+            "pool_timeout": 3,
+            "keepalive_connections": 20,
+            "keepalive_expiry": 30,
+            "http2": False,
+        },
+        # Webhook 模式：在 listen:port 上接收 Telegram 推送，url 不为空时自动调用 setWebhook，
+        # 启动失败时回退到长轮询；只接受带有 secret_token 的推送，为空时若填写了 url 则自动生成，
+        # 否则（由外部调用 setWebhook）必须填写
+        "webhook": {
+            "enabled": False,
+            "listen": "127.0.0.1",
+            "port": 8443,
+            "path": "/telegram",
+            "url": None,
+            "secret_token": None,
+        },
     }
     
     whitelist: Dict[str, Any] = {
         "add_when_bind": True,
-        "verify_player": True
+        "verify_player": True,
+        # 玩家档案查询接口，{} 会被替换为玩家名；结果缓存的秒数分别对应“存在”和“不存在”
+        "profile_api": "https://api.mojang.com/users/profiles/minecraft/{}",
+        "profile_cache_ttl": 3600,
+        "profile_negative_ttl": 300,
+    }
+
+    # 多服务器：mode 为 standalone（单独运行）、hub（持有 Telegram 连接，并在 socket 上接受其他实例）
+    # 或 node（不连接 Telegram，经 socket 连接 hub）；name 为本服务器在 /命令@name 中的名字，
+    # 节点的游戏内消息每 batch_interval 秒批量交给 hub，hub 等待节点回应最多 request_timeout 秒。
+    # socket 为空时使用 $XDG_RUNTIME_DIR/telegram_chat.sock，未设置该变量时为数据目录下的同名文件
+    # （此时节点需要填写 hub 的路径）；secret 为 hub 与节点共享的密钥，连接时双方互相验证，必须填写。
+    # 各实例的 admins、group 与 permissions 应保持一致
+    hub: Dict[str, Any] = {
+        "mode": "standalone",
+        "name": "server",
+        "socket": None,
+        "secret": "",
+        "batch_interval": 0.05,
+        "request_timeout": 3,
+    }
+
+    # 广播目标：游戏内消息除发到 group 外，还会按 events 转发到 chats 中的聊天（群聊或频道），
+    # 例如 {"chat_id": -1001234567890, "events": ["chat", "join", "leave"]}，公开频道也可以填写 "@频道用户名"；
+    # events 可包含 chat（游戏内聊天）、join（进入游戏）、leave（离开游戏）与 tg（!!tg 消息），
+    # concurrency 为同时发送的聊天数，每个聊天各自限流
+    broadcast: Dict[str, Any] = {
+        "chats": [],
+        "concurrency": 8,
+    }
+
+    # 群聊发送限流：rate 为每秒恢复的消息数，burst 为可连续发送的消息数，
+    # 超出后排队合并，最多等待 max_delay 秒
+    outbound: Dict[str, Any] = {
+        "rate": 0.33,
+        "burst": 5,
+        "max_delay": 3.0,
+    }
+
+    # RCON 查询：workers 为线程池大小，timeout 为单条命令超时秒数，
+    # read_only 中的命令在 cache_ttl 秒内复用结果
+    rcon: Dict[str, Any] = {
+        "workers": 2,
+        "timeout": 10,
+        "cache_ttl": 2.0,
+        "read_only": ["list", "whitelist list", "banlist", "banlist players", "banlist ips", "seed"],
+    }
+
+    # 停机期间积压的消息：policy 为 drop（全部丢弃）、commands（只执行命令）
+    # 或 summary（丢弃命令，聊天消息合并为一条摘要，保留最近 summary_lines 条）；
+    # 早于 max_age 秒的消息无论是否积压都会丢弃，0 表示不限。
+    # 积压只在插件加载时出现，热重载修改 policy 不会重新处理已经收到的消息；drop 还会让 Telegram 直接丢弃积压的 Update，
+    # 但 Webhook 由外部调用 setWebhook（未填写 url）时 Telegram 仍会推送，由本插件按 policy 丢弃
+    backlog: Dict[str, Any] = {
+        "policy": "commands",
+        "max_age": 300,
+        "summary_lines": 5,
+    }
+
+    # /info 使用的后台采样：interval 为采样间隔秒数，history 为保留的采样数，
+    # window_minutes 为默认统计的时间范围
+    system_monitor: Dict[str, Any] = {
+        "interval": 5,
+        "history": 720,
+        "window_minutes": 5,
+    }
+
+    # /list 使用的在线玩家列表：每 sync_interval 秒与 online_player_api 校对一次，
+    # 同一聊天 dedup_window 秒内的重复请求只回复一次
+    roster: Dict[str, Any] = {
+        "sync_interval": 60,
+        "dedup_window": 3,
+    }
+
+    # 命令限流：rate 为每秒恢复的次数，burst 为可连续执行的次数；
+    # commands 为单个用户对特定命令的额外限制，管理员的限额乘以 admin_multiplier；
+    # 超出限额的命令最多排队等待 max_wait 秒，否则直接忽略
+    throttle: Dict[str, Any] = {
+        "enabled": True,
+        "user": {"rate": 0.5, "burst": 5},
+        "chat": {"rate": 2, "burst": 20},
+        "commands": {
+            "/info": {"rate": 0.1, "burst": 2},
+            "/command": {"rate": 0.5, "burst": 3},
+            "/list": {"rate": 0.2, "burst": 3},
+            "/bind": {"rate": 0.1, "burst": 3},
+        },
+        "admin_multiplier": 4,
+        "max_wait": 0,
+        "max_entries": 10000,
     }
 
+    # 权限：roles 为额外的角色及其成员 Telegram ID（admins 中的账号固定为 admin，其余为 user），
+    # grants 为每个角色的 {权限: [范围]}，范围为 private（私聊）、group（配置的群聊）、other（其他群聊）
+    # 与 game（游戏内 !!tg）；"*" 表示全部权限，单独列出的权限覆盖 "*" 的范围
+    permissions: Dict[str, Any] = {
+        "roles": {},
+        "grants": {
+            "admin": {
+                "*": ["private", "group", "other"],
+                "chat": ["group", "other"],
+                "info": ["private"],
+                "tg": ["game"],
+            },
+            "user": {
+                "chat": ["group"],
+                "mc": ["group"],
+                "list": ["group"],
+                "bind": ["group"],
+                "whitelist": ["group"],
+                "help": ["group"],
+                "ping": ["group"],
+            },
+        },
+    }
+
+    # 每隔 export_interval 秒把指标以 Prometheus 文本格式写入数据目录下的 metrics.prom，0 表示不写入
+    metrics: Dict[str, Any] = {
+        "export_interval": 30,
+    }
+
+    # 按 sample_rate 的比例采样消息处理过程，把各阶段耗时以 JSON Lines 写入数据目录下的 traces.jsonl，
+    # 文件超过 max_bytes 字节时滚动，保留 backup_count 个旧文件；0 表示不采样
+    tracing: Dict[str, Any] = {
+        "sample_rate": 0.0,
+        "max_bytes": 10 * 1024 * 1024,
+        "backup_count": 3,
+    }
+
+    # 绑定数据与封禁列表的存储方式：sqlite 或 json
+    storage: Dict[str, Any] = {
+        "backend": "sqlite",
+    }
+
+def parse_chat_id(chat_id: int | str) -> int | str:
+    """
+    数字形式的聊天 ID 转为 int，@频道用户名原样保留
+    """
+    text = str(chat_id).strip()
+    return int(text) if text.lstrip("-").isdigit() else text
+
 class ConfigManager:
     config: Config = Config()
-    bindings: dict[str, str] = {}
+    bindings: BindingStore = BindingStore()
     ban_list: List[int] = []
     online_player_api: Any = None # type: ignore
-    bot: TelegramBot = None # type: ignore
+    bot: TelegramBot | HubClient = None # type: ignore
+    hub: HubServer | None = None
+    outbound: OutboundQueue = None # type: ignore
+    storage: Storage = None # type: ignore
+    profiles: ProfileResolver = ProfileResolver()
+    rcon: RconExecutor = None # type: ignore
+    sampler: SystemSampler = None # type: ignore
+    roster: Roster = None # type: ignore
+    backlog: Backlog = None # type: ignore
+    throttle: Throttle | None = None
     logger: logging.Logger = None # type: ignore
+    # 由 config.admins 与 ban_list 预先计算的集合，供每条消息快速判断
+    admin_ids: set[int] = set()
+    banned: set[int] = set()
+    permissions: PermissionTable = PermissionTable([], {}, {})
+    # 事件 -> 广播目标聊天
+    targets: dict[str, tuple[int | str, ...]] = {}
 
     @staticmethod
     def load_data(server: PluginServerInterface):
-        ConfigManager.config = server.load_config_simple(target_class=Config) # type: ignore
-        ConfigManager.bindings = server.load_config_simple(
-            "bindings.json",
-            default_config={"data": {}},
-            echo_in_console=False
-        )["data"]
-        ConfigManager.ban_list = server.load_config_simple(
-            "ban_list.json",
-            default_config={"data": []},
-            echo_in_console=False
-        )["data"]
+        """
+        加载配置与数据；热重载时保留限流、档案缓存、采样历史与 RCON 线程池，只按新配置调整参数
+
+        新的配置与数据全部准备好后才替换，任何一步失败时保持原状
+        """
+        config: Config = server.load_config_simple(target_class=Config) # type: ignore
+        old_storage = ConfigManager.storage
+        storage_changed = old_storage is None or config.storage["backend"] != ConfigManager.config.storage["backend"]
+        storage = create_storage(server, config.storage["backend"]) if storage_changed else old_storage
+        try:
+            bindings, ban_list = storage.load()
+            store = BindingStore.from_dict(bindings, server.logger)
+            members = ConfigManager.compute_members(config, ban_list)
+            throttle = config.throttle
+            if not throttle["enabled"]: limiter = None
+            elif ConfigManager.throttle is None:
+                limiter = Throttle(
+                    throttle["user"],
+                    throttle["chat"],
+                    throttle["commands"],
+                    admin_multiplier=throttle["admin_multiplier"],
+                    max_wait=throttle["max_wait"],
+                    max_entries=throttle["max_entries"]
+                )
+            else: limiter = ConfigManager.throttle
+        except BaseException:
+            if storage is not old_storage: storage.close()
+            raise
+
+        # 以下不会失败，直接替换
+        ConfigManager.config = config
+        ConfigManager.storage = storage
+        ConfigManager.bindings, ConfigManager.ban_list = store, ban_list
+        ConfigManager.admin_ids, ConfigManager.banned, ConfigManager.permissions, ConfigManager.targets = members
+        if ConfigManager.permissions.unknown:
+            server.logger.warning(f"忽略未知的权限配置：{'，'.join(ConfigManager.permissions.unknown)}")
+        ConfigManager.profiles.configure(
+            config.whitelist.get("profile_api", MOJANG_PROFILE_API),
+            ttl=config.whitelist.get("profile_cache_ttl", 3600),
+            negative_ttl=config.whitelist.get("profile_negative_ttl", 300)
+        )
+        rcon = config.rcon
+        if ConfigManager.rcon is None:
+            ConfigManager.rcon = RconExecutor(
+                workers=rcon["workers"],
+                timeout=rcon["timeout"],
+                cache_ttl=rcon["cache_ttl"],
+                read_only=rcon["read_only"]
+            )
+        else: ConfigManager.rcon.configure(rcon["workers"], rcon["timeout"], rcon["cache_ttl"], rcon["read_only"])
+        monitor = config.system_monitor
+        if ConfigManager.sampler is None:
+            ConfigManager.sampler = SystemSampler(
+                interval=monitor["interval"],
+                history=monitor["history"],
+                server_pid=server.get_server_pid
+            )
+            ConfigManager.sampler.start()
+        else: ConfigManager.sampler.configure(monitor["interval"], monitor["history"])
+        if limiter is not None and limiter is ConfigManager.throttle:
+            limiter.configure(
+                throttle["user"],
+                throttle["chat"],
+                throttle["commands"],
+                admin_multiplier=throttle["admin_multiplier"],
+                max_wait=throttle["max_wait"],
+                max_entries=throttle["max_entries"]
+            )
+        ConfigManager.throttle = limiter
+        if storage is not old_storage and old_storage is not None: old_storage.close()
 
     @staticmethod
     def save_data(server: PluginServerInterface):
         """
         保存数据
         """
-        server.save_config_simple(
-            {
-                "data": ConfigManager.bindings,
-            },
-            "bindings.json"
-        )
-        server.save_config_simple(
-            {
-                "data": ConfigManager.ban_list,
-            },
-            "ban_list.json"
-        )
\ No newline at end of file
+        ConfigManager.storage.save_all(ConfigManager.bindings.to_dict(), ConfigManager.ban_list)
+
+    @staticmethod
+    def export_data(server: PluginServerInterface):
+        """
+        导出数据到 bindings.json 与 ban_list.json
+        """
+        save_json(server, ConfigManager.bindings.to_dict(), ConfigManager.ban_list)
+
+    @staticmethod
+    def bind_player(id: int | str, player: str) -> str | None:
+        """
+        绑定账号并写入存储，返回被覆盖的旧玩家名
+        """
+        old = ConfigManager.bindings.bind(id, player)
+        ConfigManager.storage.set_binding(int(id), player)
+        return old
+
+    @staticmethod
+    def unbind_player(id: int | str) -> str | None:
+        """
+        解除绑定并写入存储，返回原先绑定的玩家名
+        """
+        player = ConfigManager.bindings.unbind(id)
+        if player is not None: ConfigManager.storage.remove_binding(int(id))
+        return player
+
+    @staticmethod
+    def compute_members(config: Config, ban_list: List[int]) -> tuple[set[int], set[int], PermissionTable, dict[str, tuple[int | str, ...]]]:
+        """
+        根据 config.admins 与 ban_list 计算管理员与封禁集合，编译权限表并计算各事件的广播目标
+        """
+        admin_ids = {int(id) for id in config.admins if str(id).lstrip("-").isdigit()}
+        banned = {int(id) for id in ban_list}
+        permissions = PermissionTable.from_config(admin_ids, config.permissions)
+        group = (config.group,) if config.group else ()
+        targets = {
+            event: group + tuple(chat_id for chat_id in (parse_chat_id(chat["chat_id"]) for chat in config.broadcast["chats"]
+                                                         if event in chat.get("events", BROADCAST_EVENTS))
+                                 if chat_id not in group)
+            for event in BROADCAST_EVENTS
+        }
+        return admin_ids, banned, permissions, targets
+
+    @staticmethod
+    def index_members():
+        """
+        根据 config.admins 与 ban_list 重新计算管理员与封禁集合，重新编译权限表并计算各事件的广播目标
+        """
+        (ConfigManager.admin_ids, ConfigManager.banned,
+         ConfigManager.permissions, ConfigManager.targets) = ConfigManager.compute_members(ConfigManager.config, ConfigManager.ban_list)
+
+    @staticmethod
+    def is_admin(id: int | str) -> bool:
+        return int(id) in ConfigManager.admin_ids
+
+    @staticmethod
+    def is_banned(id: int | str) -> bool:
+        return int(id) in ConfigManager.banned
+
+    @staticmethod
+    def ban_user(id: int) -> bool:
+        if id in ConfigManager.banned: return False
+        ConfigManager.ban_list.append(id)
+        ConfigManager.banned.add(id)
+        ConfigManager.storage.add_ban(id)
+        return True
+
+    @staticmethod
+    def pardon_user(id: int) -> bool:
+        if id not in ConfigManager.banned: return False
+        if id in ConfigManager.ban_list: ConfigManager.ban_list.remove(id)
+        ConfigManager.banned.discard(id)
+        ConfigManager.storage.remove_ban(id)
+        return True
+
+    @staticmethod
+    def close():
+        """
+        保存并释放各项资源，Profile 查询的 HTTP 客户端需要在 Bot 的事件循环停止前关闭
+        """
+        ConfigManager.profiles.close()
+        if ConfigManager.backlog is not None: ConfigManager.backlog.save()
+        if ConfigManager.storage is not None: ConfigManager.storage.close()
+        ConfigManager.storage = None # type: ignore
+        if ConfigManager.rcon is not None: ConfigManager.rcon.shutdown()
+        ConfigManager.rcon = None # type: ignore
+        if ConfigManager.sampler is not None: ConfigManager.sampler.stop()
+        ConfigManager.sampler = None # type: ignore
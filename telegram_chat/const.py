@@ -1,4 +1,4 @@
-VERSION = (2, 0, 4)
+VERSION = (3, 0, 0)
 VERSION_STR = '.'.join(map(str, VERSION))
 
 class Help():
@@ -24,13 +24,16 @@ class Help():
 - /mcdr <command> 向 MCDR 进程发送命令
 - /whitelist <add|remove> <玩家名> 管理白名单，使用 /whitelist 获取详细帮助
 - /start /stop /restart 启动、关闭、重启服务器
-- /info 仅私聊，获取系统信息
-- /reload 重载 Bot
+- /info [分钟] 仅私聊，获取系统信息及最近一段时间的统计
+- /reload 重载配置与命令，连接配置变化时重启 Bot
+- /reload plugin 重新加载整个插件
 - /ban 封禁某人（游戏内）
 - /pardon 解除对某人的封禁（游戏内）
 - /bot-ban 不允许某人使用 Bot
 - /bot-pardon 不再禁止某人使用 Bot
 - /save 保存 Bot 配置文件
+- /export 导出绑定数据与封禁列表为 JSON 文件
+- /stats 查看命令耗时、API 调用与队列统计
 """
 
     bind = """/bind <ID> 绑定当前 Telegram 账号到 Minecraft 账号
@@ -0,0 +1,52 @@
+import asyncio
+import time
+from typing import Any
+
+import httpx
+from telegram.error import TimedOut
+from telegram.request import BaseRequest, HTTPXRequest
+
+from .metrics import metrics
+
+class MeteredRequest(HTTPXRequest):
+    """
+    记录连接池占用与等待时间的 HTTPXRequest
+
+    在 httpx 连接池前放一个同样大小的信号量，请求在这里排队，排队时间即连接池等待时间；
+    等待超过 pool_timeout 秒时与 PTB 一样抛出 TimedOut，请求不会发出
+    """
+    def __init__(self, pool: str, connection_pool_size: int = 64, pool_timeout: float | None = 3,
+                 keepalive_connections: int = 20, keepalive_expiry: float = 30, **kwargs: Any):
+        limits = httpx.Limits(
+            max_connections=connection_pool_size,
+            max_keepalive_connections=min(keepalive_connections, connection_pool_size),
+            keepalive_expiry=keepalive_expiry
+        )
+        super().__init__(connection_pool_size=connection_pool_size, pool_timeout=pool_timeout,
+                         httpx_kwargs={"limits": limits}, **kwargs)
+        self.pool = pool
+        self.size = connection_pool_size
+        self.pool_timeout = pool_timeout
+        self.in_use = 0
+        self._slots = asyncio.Semaphore(connection_pool_size)
+
+    async def do_request(self, url: str, method: str, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE) -> tuple[int, bytes]:
+        # 未指定时 PTB 传入的是 DefaultValue 占位符
+        timeout = pool_timeout if pool_timeout is None or isinstance(pool_timeout, (int, float)) else self.pool_timeout
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("telegram_chat_http_pool_timeouts_total", pool=self.pool)
+            raise TimedOut(f"Pool timeout: all {self.size} connections of the {self.pool} pool are in use.")
+        metrics.observe("telegram_chat_http_pool_wait_seconds", time.perf_counter() - start, pool=self.pool)
+
+        self.in_use += 1
+        try:
+            return await super().do_request(url, method, request_data, read_timeout, write_timeout,
+                                            connect_timeout, pool_timeout)
+        finally:
+            self.in_use -= 1
+            self._slots.release()
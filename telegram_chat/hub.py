@@ -0,0 +1,405 @@
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import logging
+import os
+import secrets
+import stat
+import struct
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+from telegram import MessageEntity, Update
+
+from .telegram_manager import LoopThread
+
+# 帧格式：4 字节大端长度 + 紧凑 JSON
+_HEADER = struct.Struct(">I")
+MAX_FRAME = 1 << 20
+
+def encode_frame(message: dict[str, Any]) -> bytes:
+    data = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode()
+    return _HEADER.pack(len(data)) + data
+
+async def read_frame(reader: asyncio.StreamReader) -> dict[str, Any] | None:
+    """
+    读取一帧，连接关闭时返回 None
+    """
+    try:
+        header = await reader.readexactly(_HEADER.size)
+        (length,) = _HEADER.unpack(header)
+        if length > MAX_FRAME: raise ValueError(f"Frame too large: {length} bytes")
+        return json.loads(await reader.readexactly(length))
+    except asyncio.IncompleteReadError:
+        return None
+
+def sign(secret: str, *parts: str) -> str:
+    """
+    握手签名：双方各自发出随机数，对方用共享密钥签名后返回，密钥本身不经过套接字
+    """
+    return hmac.new(secret.encode(), "\0".join(parts).encode(), hashlib.sha256).hexdigest()
+
+def verify(secret: str, signature: Any, *parts: str) -> bool:
+    return isinstance(signature, str) and hmac.compare_digest(signature.encode(), sign(secret, *parts).encode())
+
+def default_socket_path(data_folder: str) -> str:
+    """
+    默认套接字路径：$XDG_RUNTIME_DIR（仅当前用户可访问），否则为数据目录
+    """
+    return os.path.join(os.environ.get("XDG_RUNTIME_DIR") or data_folder, "telegram_chat.sock")
+
+def split_target(content: str) -> tuple[str, str | None]:
+    """
+    拆分 /命令@目标，返回去掉 @目标 的命令与目标名
+    """
+    if not content.startswith('/'): return content, None
+    head, sep, rest = content.partition(' ')
+    command, at, target = head.partition('@')
+    if not at or not target: return content, None
+    return command + sep + rest, target
+
+class _Node:
+    __slots__ = ("name", "writer")
+
+    def __init__(self, name: str, writer: asyncio.StreamWriter):
+        self.name = name
+        self.writer = writer
+
+class HubServer:
+    """
+    Hub 模式：持有 Telegram 连接的实例在 Unix 套接字上接受其他 MCDR 实例（节点）的连接
+
+    节点发来的游戏内事件与回复由 on_events / on_send 交给 Hub 发送，
+    /命令@节点名 由 forward() 转交给对应节点执行；
+    连接时双方用共享密钥 secret 互相验证，套接字文件权限为 0600
+    """
+    def __init__(self, logger: logging.Logger, path: str, name: str, secret: str,
+                 on_events: Callable[[str, list[dict[str, Any]]], Awaitable[Any]],
+                 on_send: Callable[[dict[str, Any]], Awaitable[Any]],
+                 request_timeout: float = 3):
+        if not secret: raise ValueError("Hub secret must not be empty.")
+        self.logger = logger
+        self.path = path
+        self.name = name
+        self.secret = secret
+        self.nodes: dict[str, _Node] = {}
+        self.request_timeout = request_timeout
+        self._on_events = on_events
+        self._on_send = on_send
+        self._server: asyncio.AbstractServer | None = None
+        self._requests: dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+
+    async def start(self):
+        await self._remove_stale_socket()
+        self._server = await asyncio.start_unix_server(self._handle, self.path)
+        # 不修改 umask（对整个进程生效），绑定后立即收紧权限；在此之前连接的节点仍需通过握手验证
+        os.chmod(self.path, 0o600)
+        self.logger.info(f"Hub listening on {self.path}")
+
+    async def _remove_stale_socket(self):
+        """
+        删除上次未清理的套接字文件；路径上不是套接字或已有 Hub 在监听时拒绝启动
+        """
+        try:
+            mode = os.lstat(self.path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode): raise RuntimeError(f"{self.path} exists and is not a socket.")
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_unix_connection(self.path), self.request_timeout)
+        except (OSError, asyncio.TimeoutError):
+            os.unlink(self.path)
+            return
+        writer.close()
+        raise RuntimeError(f"Another hub is already listening on {self.path}.")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            if os.path.exists(self.path): os.unlink(self.path)
+        for node in list(self.nodes.values()): node.writer.close()
+        self.nodes.clear()
+        for future in self._requests.values(): future.cancel()
+        self._requests.clear()
+
+    async def _handshake(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> str | None:
+        """
+        验证节点并向节点证明自己持有密钥，成功时返回节点名
+        """
+        nonce = secrets.token_hex(16)
+        writer.write(encode_frame({"t": "challenge", "nonce": nonce}))
+        try:
+            await asyncio.wait_for(writer.drain(), self.request_timeout)
+            hello = await asyncio.wait_for(read_frame(reader), self.request_timeout)
+        except (asyncio.TimeoutError, OSError, ValueError):
+            return None
+        if hello is None or hello.get("t") != "hello" or not hello.get("name") or not isinstance(hello.get("nonce"), str):
+            return None
+        name = str(hello["name"])
+        if not verify(self.secret, hello.get("signature"), "node", nonce, name):
+            self.logger.warning(f"Rejected a node connection claiming to be {name}: bad signature.")
+            return None
+        writer.write(encode_frame({"t": "welcome", "signature": sign(self.secret, "hub", hello["nonce"], name)}))
+        return name
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        name = await self._handshake(reader, writer)
+        if name is None:
+            writer.close()
+            return
+
+        node = _Node(name, writer)
+        old = self.nodes.get(node.name)
+        if old is not None: old.writer.close()
+        self.nodes[node.name] = node
+        self.logger.info(f"Node {node.name} connected.")
+        try:
+            while (frame := await read_frame(reader)) is not None:
+                await self._dispatch(node, frame)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Connection to node {node.name} failed: {e}")
+        finally:
+            if self.nodes.get(node.name) is node: del self.nodes[node.name]
+            writer.close()
+            self.logger.info(f"Node {node.name} disconnected.")
+
+    async def _dispatch(self, node: _Node, frame: dict[str, Any]):
+        try:
+            match frame.get("t"):
+                case "events":
+                    await self._on_events(node.name, frame["items"])
+                case "send":
+                    await self._on_send(frame["kwargs"])
+                case "result":
+                    future = self._requests.pop(frame["id"], None)
+                    if future is not None and not future.done(): future.set_result(frame.get("result"))
+        except Exception as e:
+            self.logger.error(f"Failed to handle a frame from node {node.name}: {e}")
+
+    async def _write(self, node: _Node, message: dict[str, Any]):
+        node.writer.write(encode_frame(message))
+        try:
+            await asyncio.wait_for(node.writer.drain(), self.request_timeout)
+        except asyncio.TimeoutError:
+            # 节点不再读取，断开以免缓冲区无限增长
+            node.writer.close()
+            raise OSError(f"Node {node.name} is not reading.")
+
+    async def forward(self, name: str, event: Update, content: str) -> bool:
+        """
+        把 Update 转交给节点处理，消息文本替换为 content
+        """
+        node = self.nodes.get(name)
+        if node is None: return False
+        update = event.to_dict()
+        update["message"]["text"] = content
+        update["message"].pop("entities", None)
+        try:
+            await self._write(node, {"t": "update", "update": update})
+        except OSError as e:
+            self.logger.warning(f"Failed to forward an update to node {name}: {e}")
+            return False
+        return True
+
+    async def broadcast(self, event: Update):
+        """
+        把 Update 转交给全部节点，用于各服务器各自转发群聊消息
+        """
+        for name in list(self.nodes):
+            await self.forward(name, event, event.message.text) # type: ignore
+
+    async def call(self, name: str, method: str) -> Any:
+        """
+        调用节点注册的处理函数并等待结果
+        """
+        node = self.nodes.get(name)
+        if node is None: raise KeyError(name)
+        id = next(self._ids)
+        future = self._requests[id] = asyncio.get_running_loop().create_future()
+        try:
+            await self._write(node, {"t": "call", "id": id, "method": method})
+            return await asyncio.wait_for(future, self.request_timeout)
+        finally:
+            self._requests.pop(id, None)
+
+    async def call_all(self, method: str) -> dict[str, Any]:
+        """
+        并发调用全部节点，忽略失败或超时的节点
+        """
+        names = list(self.nodes)
+        results = await asyncio.gather(*(self.call(name, method) for name in names), return_exceptions=True)
+        return {name: result for name, result in zip(names, results) if not isinstance(result, BaseException)}
+
+class RemoteBot:
+    """
+    节点上代替 telegram.Bot，发送请求交给 Hub 执行
+    """
+    def __init__(self, client: "HubClient"):
+        self._client = client
+
+    async def send_message(self, **kwargs):
+        entities = kwargs.pop("entities", None)
+        if entities: kwargs["entities"] = [e.to_dict() for e in entities]
+        if not await self._client.send({"t": "send", "kwargs": {k: v for k, v in kwargs.items() if v is not None}}):
+            self._client.logger.warning("Hub is not connected, dropping a reply.")
+
+class _RemoteContext:
+    __slots__ = ("bot",)
+
+    def __init__(self, bot: RemoteBot):
+        self.bot = bot
+
+class HubClient(LoopThread):
+    """
+    节点模式：不连接 Telegram，经 Unix 套接字连接 Hub
+
+    游戏内事件每 batch_interval 秒合并为一帧发送，Hub 断开期间最多缓存 max_buffer 条；
+    Hub 转来的 Update 交给 action 处理，回复经 RemoteBot 交回 Hub 发送。
+    连接时双方用共享密钥 secret 互相验证，Hub 超过 request_timeout 秒不读取时断开重连
+    """
+    name = "Hub client"
+    action: Callable
+    update_processor = None
+
+    def __init__(self, logger: logging.Logger, path: str, name: str, secret: str, batch_interval: float = 0.05,
+                 max_buffer: int = 1000, timeout: int = 60, max_pending: int = 1000, request_timeout: float = 3):
+        super().__init__(logger, timeout, max_pending)
+        if not secret: raise ValueError("Hub secret must not be empty.")
+        self.path = path
+        self.node_name = name
+        self.secret = secret
+        self.batch_interval = batch_interval
+        self.request_timeout = request_timeout
+        self.bot = RemoteBot(self)
+        self.context = _RemoteContext(self.bot)
+        # call 请求可以调用的处理函数
+        self.handlers: dict[str, Callable[[], Any]] = {}
+        self._buffer: deque[dict[str, Any]] = deque(maxlen=max_buffer)
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    def register(self): ...
+
+    async def publish(self, event: str, text: str, entities: list[MessageEntity] | None = None):
+        """
+        把一条游戏内事件加入下一批发送
+        """
+        self._buffer.append({"event": event, "text": text, "entities": [e.to_dict() for e in entities or []]})
+        if self._flush_handle is None:
+            self._flush_handle = self.loop.call_later(self.batch_interval, lambda: self._spawn(self._flush()))
+
+    def _spawn(self, coro):
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(self._log_task)
+
+    async def _flush(self):
+        self._flush_handle = None
+        if self._writer is None or not self._buffer: return
+        items = list(self._buffer)
+        self._buffer.clear()
+        await self.send({"t": "events", "items": items})
+
+    async def send(self, message: dict[str, Any]) -> bool:
+        """
+        发送一帧并等待写入缓冲区排空，未连接或 Hub 不再读取时返回 False
+        """
+        writer = self._writer
+        if writer is None: return False
+        writer.write(encode_frame(message))
+        try:
+            await asyncio.wait_for(writer.drain(), self.request_timeout)
+        except (asyncio.TimeoutError, OSError) as e:
+            self.logger.warning(f"Hub is not reading, closing the connection: {e!r}")
+            writer.close()
+            return False
+        return True
+
+    async def _handshake(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        """
+        向 Hub 证明自己持有密钥，并验证 Hub 同样持有
+        """
+        nonce = secrets.token_hex(16)
+        try:
+            challenge = await asyncio.wait_for(read_frame(reader), self.request_timeout)
+            if challenge is None or challenge.get("t") != "challenge" or not isinstance(challenge.get("nonce"), str):
+                return False
+            writer.write(encode_frame({
+                "t": "hello",
+                "name": self.node_name,
+                "nonce": nonce,
+                "signature": sign(self.secret, "node", challenge["nonce"], self.node_name)
+            }))
+            await asyncio.wait_for(writer.drain(), self.request_timeout)
+            welcome = await asyncio.wait_for(read_frame(reader), self.request_timeout)
+        except (asyncio.TimeoutError, OSError, ValueError):
+            return False
+        return (welcome is not None and welcome.get("t") == "welcome"
+                and verify(self.secret, welcome.get("signature"), "hub", nonce, self.node_name))
+
+    async def _serve(self):
+        # 节点不必等待 Hub 上线，连接在后台进行
+        self._set_ready()
+        connector = asyncio.create_task(self._connect())
+        await self.stop_sign.wait()
+        connector.cancel()
+        if self._writer is not None: self._writer.close()
+
+    async def _connect(self):
+        delay = 1
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+
+            if not await self._handshake(reader, writer):
+                writer.close()
+                self.logger.warning(f"Hub at {self.path} failed authentication, check hub.secret.")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+
+            delay = 1
+            self._writer = writer
+            self._spawn(self._flush())
+            self.logger.info(f"Connected to hub at {self.path}")
+            try:
+                while (frame := await read_frame(reader)) is not None:
+                    self._dispatch(frame)
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Connection to hub failed: {e}")
+            finally:
+                self._writer = None
+                writer.close()
+            self.logger.warning("Disconnected from hub, reconnecting.")
+
+    def _dispatch(self, frame: dict[str, Any]):
+        match frame.get("t"):
+            case "update":
+                update = Update.de_json(frame["update"], None) # type: ignore
+                self._spawn(self.action(update, self.context))
+            case "call":
+                handler = self.handlers.get(frame.get("method", ""))
+                try:
+                    result = handler() if handler is not None else None
+                except Exception as e:
+                    self.logger.error(f"Hub call {frame.get('method')} failed: {e}")
+                    result = None
+                self._spawn(self.send({"t": "result", "id": frame["id"], "result": result}))
+
+    def _log_task(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error(f"Hub client task failed: {task.exception()}")
@@ -1,9 +1,121 @@
+import os
 import platform
-import psutil
+import threading
+import time
+from collections import deque
+from functools import cache
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple
 
-def get_system_info():
-    # 获取系统的基本信息
-    system_info = {
+# psutil 在采样线程中首次使用时才导入，不拖慢插件加载
+if TYPE_CHECKING:
+    import psutil
+
+class Snapshot(NamedTuple):
+    time: float
+    cpu_percent: float
+    memory: Any
+    disk: Any
+    bytes_sent: int
+    bytes_recv: int
+    mcdr_rss: int
+    server_rss: int | None
+
+class SystemSampler:
+    """
+    后台定时采集系统信息，保存在固定长度的环形缓冲区中
+
+    /info 只读取缓冲区，不再现场阻塞采样
+    """
+    def __init__(self, interval: float = 5, history: int = 720, server_pid: Callable[[], int | None] = lambda: None):
+        self.interval = interval
+        self.samples: deque[Snapshot] = deque(maxlen=history)
+        self.server_pid = server_pid
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._mcdr: "psutil.Process | None" = None
+        self._server: "psutil.Process | None" = None
+        self.addresses: dict[str, list[Any]] = {}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="TelegramChat-Sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def configure(self, interval: float, history: int):
+        """
+        更新采样间隔与保留的采样数，已有的采样保留（超出 history 时丢弃最早的）
+        """
+        self.interval = interval
+        if history != self.samples.maxlen:
+            self.samples = deque(self.samples, maxlen=history)
+
+    def _run(self):
+        import psutil
+        psutil.cpu_percent(interval=None) # 第一次调用只用于建立基准
+        try:
+            self.sample()
+        except Exception: ...
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception: ...
+
+    def _server_rss(self) -> int | None:
+        import psutil
+        pid = self.server_pid()
+        if pid is None: return None
+        try:
+            if self._server is None or self._server.pid != pid:
+                self._server = psutil.Process(pid)
+            return self._server.memory_info().rss
+        except psutil.Error:
+            self._server = None
+            return None
+
+    def sample(self) -> Snapshot:
+        import psutil
+        if self._mcdr is None: self._mcdr = psutil.Process(os.getpid())
+        net = psutil.net_io_counters()
+        snapshot = Snapshot(
+            time.time(),
+            psutil.cpu_percent(interval=None),
+            psutil.virtual_memory(),
+            psutil.disk_usage('/'),
+            net.bytes_sent,
+            net.bytes_recv,
+            self._mcdr.memory_info().rss,
+            self._server_rss()
+        )
+        self.samples.append(snapshot)
+        self.addresses = psutil.net_if_addrs()
+        return snapshot
+
+    def latest(self) -> Snapshot:
+        # 采样线程会同时追加，先复制一份再读取
+        samples = list(self.samples)
+        return samples[-1] if samples else self.sample()
+
+    def window(self, minutes: float) -> list[Snapshot]:
+        """
+        最近 minutes 分钟内的采样
+        """
+        since = time.time() - minutes * 60
+        result = []
+        for snapshot in reversed(list(self.samples)):
+            if snapshot.time < since: break
+            result.append(snapshot)
+        result.reverse()
+        return result
+
+@cache
+def _platform_info() -> dict[str, Any]:
+    """
+    不会变化的系统信息，第一次使用时读取
+    """
+    import psutil
+    return {
         "操作系统": platform.system(),
         "主机名": platform.node(),
         "操作系统版本": platform.release(),
@@ -11,56 +123,64 @@ def get_system_info():
         "机器架构": platform.machine(),
         "处理器": platform.processor(),
         "CPU 核心数": psutil.cpu_count(logical=True),  # 获取逻辑CPU核心数
-        "CPU 使用率": psutil.cpu_percent(interval=1),  # 获取CPU使用率
-        "内存信息": {
-            "总内存": psutil.virtual_memory().total,  # 获取总内存
-            "可用内存": psutil.virtual_memory().available,  # 获取可用内存
-            "内存使用率": psutil.virtual_memory().percent,  # 获取内存使用率
-            "已用内存": psutil.virtual_memory().used,  # 获取已用内存
-            "空闲内存": psutil.virtual_memory().free,  # 获取空闲内存
-        },
-        "磁盘信息": {
-            "磁盘总容量": psutil.disk_usage('/').total,  # 获取磁盘总容量
-            "磁盘已用容量": psutil.disk_usage('/').used,  # 获取磁盘已用容量
-            "磁盘空闲容量": psutil.disk_usage('/').free,  # 获取磁盘空闲容量
-            "磁盘使用率": psutil.disk_usage('/').percent,  # 获取磁盘使用率
-        },
-        "网络信息": psutil.net_if_addrs()  # 获取网络接口的地址信息
     }
-    
+
+def _summary(name: str, values: list[float], formatter: Callable[[float], str]) -> str:
+    return f"\t{name}: 最小 {formatter(min(values))}  平均 {formatter(sum(values) / len(values))}  最大 {formatter(max(values))}\n"
+
+def get_system_info(sampler: SystemSampler, minutes: float = 5):
+    snapshot = sampler.latest()
+    memory, disk = snapshot.memory, snapshot.disk
+    _platform = _platform_info()
+
     # 格式化并输出系统信息为中文可读格式
     formatted_info = f"""系统信息：
-\t操作系统: {system_info["操作系统"]} {system_info["操作系统版本"]} ({system_info["操作系统详细版本"]})
-\t主机名: {system_info["主机名"]}
-\t机器架构: {system_info["机器架构"]}
-\t处理器: {system_info["处理器"]}
-\tCPU 核心数: {system_info["CPU 核心数"]}
-\tCPU 使用率: {system_info["CPU 使用率"]}%
+\t操作系统: {_platform["操作系统"]} {_platform["操作系统版本"]} ({_platform["操作系统详细版本"]})
+\t主机名: {_platform["主机名"]}
+\t机器架构: {_platform["机器架构"]}
+\t处理器: {_platform["处理器"]}
+\tCPU 核心数: {_platform["CPU 核心数"]}
+\tCPU 使用率: {snapshot.cpu_percent}%
 
 内存信息：
-\t总内存: {format_bytes(system_info["内存信息"]["总内存"])}
-\t可用内存: {format_bytes(system_info["内存信息"]["可用内存"])}
-\t已用内存: {format_bytes(system_info["内存信息"]["已用内存"])}
-\t空闲内存: {format_bytes(system_info["内存信息"]["空闲内存"])}
-\t内存使用率: {system_info["内存信息"]["内存使用率"]}%
+\t总内存: {format_bytes(memory.total)}
+\t可用内存: {format_bytes(memory.available)}
+\t已用内存: {format_bytes(memory.used)}
+\t空闲内存: {format_bytes(memory.free)}
+\t内存使用率: {memory.percent}%
+\tMCDR 进程内存: {format_bytes(snapshot.mcdr_rss)}
+\t服务端进程内存: {format_bytes(snapshot.server_rss) if snapshot.server_rss is not None else "未运行"}
 
 磁盘信息：
-\t磁盘总容量: {format_bytes(system_info["磁盘信息"]["磁盘总容量"])}
-\t磁盘已用容量: {format_bytes(system_info["磁盘信息"]["磁盘已用容量"])}
-\t磁盘空闲容量: {format_bytes(system_info["磁盘信息"]["磁盘空闲容量"])}
-\t磁盘使用率: {system_info["磁盘信息"]["磁盘使用率"]}%
+\t磁盘总容量: {format_bytes(disk.total)}
+\t磁盘已用容量: {format_bytes(disk.used)}
+\t磁盘空闲容量: {format_bytes(disk.free)}
+\t磁盘使用率: {disk.percent}%
 
 网络信息：
+\t已发送: {format_bytes(snapshot.bytes_sent)}
+\t已接收: {format_bytes(snapshot.bytes_recv)}
 """
-    
-    for interface, addresses in system_info["网络信息"].items():
+
+    for interface, addresses in sampler.addresses.items():
         formatted_info += f"\t{interface}:\n"
         for addr in addresses:
-            # 由于psutil.net_if_addrs()返回的每个地址信息是一个元组，包含address、netmask、broadcast等
-            # addr[0] 是 address, addr[1] 是 netmask, addr[2] 是 broadcast
             formatted_info += f"\t\t地址: {addr.address}  子网掩码: {addr.netmask}  广播地址: {addr.broadcast}\n"
-    
-    return formatted_info.replace("\t", ' ' * 4) 
+
+    samples = sampler.window(minutes)
+    if len(samples) > 1:
+        formatted_info += f"\n最近 {minutes:g} 分钟（{len(samples)} 次采样）：\n"
+        formatted_info += _summary("CPU 使用率", [s.cpu_percent for s in samples], lambda v: f"{v:.1f}%")
+        formatted_info += _summary("内存使用率", [s.memory.percent for s in samples], lambda v: f"{v:.1f}%")
+        formatted_info += _summary("MCDR 进程内存", [s.mcdr_rss for s in samples], format_bytes)
+        server_rss = [s.server_rss for s in samples if s.server_rss is not None]
+        if server_rss: formatted_info += _summary("服务端进程内存", server_rss, format_bytes) # type: ignore
+        elapsed = samples[-1].time - samples[0].time
+        if elapsed > 0:
+            formatted_info += f"\t平均上传速率: {format_bytes((samples[-1].bytes_sent - samples[0].bytes_sent) / elapsed)}/s\n"
+            formatted_info += f"\t平均下载速率: {format_bytes((samples[-1].bytes_recv - samples[0].bytes_recv) / elapsed)}/s\n"
+
+    return formatted_info.replace("\t", ' ' * 4)
 
 def format_bytes(byte_size):
     """ 将字节数转换为人类可读的格式（KB, MB, GB等） """
@@ -72,5 +192,5 @@ def format_bytes(byte_size):
 
 if __name__ == '__main__':
     # 获取并打印系统信息
-    system_info = get_system_info()
-    print(system_info)
\ No newline at end of file
+    system_info = get_system_info(SystemSampler())
+    print(system_info)
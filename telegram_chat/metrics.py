@@ -0,0 +1,223 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable
+
+# 直方图桶上界（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+Labels = tuple[tuple[str, str], ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self) -> "Histogram":
+        histogram = Histogram()
+        histogram.counts = list(self.counts)
+        histogram.sum = self.sum
+        histogram.count = self.count
+        return histogram
+
+    def quantile(self, q: float) -> float:
+        """
+        估算分位数，返回所在桶的上界
+        """
+        if not self.count: return 0
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return float("inf")
+
+class Metrics:
+    """
+    插件内部指标：计数器、直方图与回调式仪表
+
+    事件循环与 MCDR 线程写入、导出线程读取，写入与 snapshot() 都持有 _lock
+    """
+    def __init__(self):
+        self.counters: dict[tuple[str, Labels], float] = {}
+        self.histograms: dict[tuple[str, Labels], Histogram] = {}
+        self.gauges: dict[tuple[str, Labels], Callable[[], float]] = {}
+        self._lock = threading.Lock()
+        self._stop: threading.Event | None = None
+
+    @staticmethod
+    def _labels(labels: dict[str, object]) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, self._labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, self._labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name: str, func: Callable[[], float], **labels):
+        with self._lock:
+            self.gauges[(name, self._labels(labels))] = func
+
+    def clear_gauges(self):
+        with self._lock:
+            self.gauges.clear()
+
+    def get(self, name: str, **labels) -> float:
+        return self.counters.get((name, self._labels(labels)), 0)
+
+    def snapshot(self) -> tuple[dict[tuple[str, Labels], float], dict[tuple[str, Labels], Histogram],
+                                dict[tuple[str, Labels], Callable[[], float]]]:
+        """
+        复制当前的计数器、直方图与仪表，供其他线程遍历
+        """
+        with self._lock:
+            return (dict(self.counters), {key: h.copy() for key, h in self.histograms.items()}, dict(self.gauges))
+
+    @staticmethod
+    def total(counters: dict[tuple[str, Labels], float], name: str) -> float:
+        """
+        计数器在所有标签上的总和
+        """
+        return sum(v for (n, _), v in counters.items() if n == name)
+
+    def render_prometheus(self) -> str:
+        """
+        按 Prometheus 文本格式输出全部指标
+        """
+        lines: list[str] = []
+        counters, histograms, gauges = self.snapshot()
+
+        def fmt(labels: Labels, extra: Labels = ()) -> str:
+            labels = labels + extra
+            if not labels: return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+        for kind, items in (("counter", counters), ("gauge", gauges)):
+            seen: set[str] = set()
+            for (name, labels), value in sorted(items.items(), key=lambda e: e[0]):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} {kind}")
+                    seen.add(name)
+                try:
+                    lines.append(f"{name}{fmt(labels)} {value() if callable(value) else value}")
+                except Exception: ...
+
+        seen = set()
+        for (name, labels), histogram in sorted(histograms.items(), key=lambda e: e[0]):
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{fmt(labels, (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{fmt(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{fmt(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def start_exporter(self, path: str, interval: float):
+        """
+        每隔 interval 秒把指标写入 path
+        """
+        self.stop_exporter()
+        if interval <= 0: return
+        stop = self._stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.write(path)
+                except Exception: ... # 导出失败不应结束线程
+
+        threading.Thread(target=run, name="TelegramChat-Metrics", daemon=True).start()
+
+    def stop_exporter(self):
+        if self._stop is not None: self._stop.set()
+        self._stop = None
+
+    def write(self, path: str):
+        temp = f"{path}.tmp"
+        try:
+            with open(temp, "w", encoding="utf-8") as f:
+                f.write(self.render_prometheus())
+            os.replace(temp, path)
+        except OSError: ...
+
+    def summary(self) -> str:
+        """
+        /stats 使用的可读摘要
+        """
+        def describe(histogram: Histogram) -> str:
+            avg = histogram.sum / histogram.count * 1000 if histogram.count else 0
+            return f"{histogram.count} 次，平均 {avg:.1f}ms，P50 ≤ {histogram.quantile(0.5) * 1000:g}ms，P99 ≤ {histogram.quantile(0.99) * 1000:g}ms"
+
+        counters, histograms, gauges = self.snapshot()
+        lines = ["命令统计："]
+        for (name, labels), histogram in sorted(histograms.items(), key=lambda e: e[0]):
+            if name != "telegram_chat_command_duration_seconds": continue
+            route = dict(labels)["route"]
+            errors = counters.get(("telegram_chat_command_errors_total", labels), 0)
+            lines.append(f"- {route}：{describe(histogram)}，错误 {errors:g} 次")
+
+        lines.append("\n其他：")
+        for name, title in (("telegram_chat_api_duration_seconds", "Telegram API"),
+                            ("telegram_chat_rcon_duration_seconds", "RCON"),
+                            ("telegram_chat_http_pool_wait_seconds", "连接池等待"),
+                            ("telegram_chat_update_lag_seconds", "消息延迟")):
+            for (n, labels), histogram in histograms.items():
+                if n == name:
+                    suffix = "".join(f" {v}" for _, v in labels)
+                    lines.append(f"- {title}{suffix}：{describe(histogram)}")
+        lines.append(f"- Telegram 429：{self.total(counters, 'telegram_chat_api_rate_limited_total'):g} 次")
+        lines.append(f"- RCON 超时：{self.total(counters, 'telegram_chat_rcon_timeouts_total'):g} 次")
+        lines.append(f"- 连接池超时：{self.total(counters, 'telegram_chat_http_pool_timeouts_total'):g} 次")
+        lines.append(f"- 权限拒绝：{self.total(counters, 'telegram_chat_permission_denied_total'):g} 次")
+
+        values = []
+        for (name, labels), func in sorted(gauges.items(), key=lambda e: e[0]):
+            try:
+                values.append(f"- {name}{''.join(f' {v}' for _, v in labels)}：{func():g}")
+            except Exception: ...
+        if values: lines += ["\n队列："] + values
+        return "\n".join(lines)
+
+metrics = Metrics()
+
+class timer:
+    """
+    记录 with 代码块的耗时到直方图
+    """
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name: str, **labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable
+
+from telegram import MessageEntity
+from telegram.constants import MessageLimit
+from telegram.error import RetryAfter
+
+def utf16_len(text: str) -> int:
+    """
+    Telegram 的实体偏移量以 UTF-16 码元计
+    """
+    return len(text.encode("utf-16-le")) // 2
+
+class TokenBucket:
+    """
+    令牌桶，`tokens` 可以为负，表示已经透支的额度
+    """
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount: float = 1) -> bool:
+        self._refill(time.monotonic())
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def consume(self, amount: float = 1):
+        """
+        强制扣除令牌，不足时透支
+        """
+        self._refill(time.monotonic())
+        self.tokens -= amount
+
+    def wait_time(self, amount: float = 1) -> float:
+        self._refill(time.monotonic())
+        if self.tokens >= amount or self.rate <= 0: return 0
+        return (amount - self.tokens) / self.rate
+
+    def block(self, seconds: float):
+        """
+        在接下来的 seconds 秒内不再发放令牌
+        """
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+class _ChatQueue:
+    __slots__ = ("bucket", "pending", "task", "retry_at")
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.pending: list[tuple[str, list[MessageEntity], dict[str, Any]]] = []
+        self.task: asyncio.Task | None = None
+        self.retry_at: float = 0
+
+class OutboundQueue:
+    """
+    群聊发送队列
+
+    每个聊天拥有独立的令牌桶，令牌充足时直接发送；
+    令牌耗尽时排队，并在令牌恢复或等待超过 max_delay 时把排队的消息合并为一条发送
+    """
+    def __init__(self, sender: Callable[..., Awaitable[Any]], logger: logging.Logger,
+                 rate: float = 20 / 60, burst: int = 5, max_delay: float = 3.0):
+        self._sender = sender
+        self._chats: dict[int | str, _ChatQueue] = {}
+        self.logger = logger
+        self.rate = rate
+        self.burst = burst
+        self.max_delay = max_delay
+        self.stats: dict[str, int] = {
+            "sent": 0,
+            "deferred": 0,
+            "merged": 0,
+            "rate_limited": 0,
+        }
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue.pending) for queue in self._chats.values())
+
+    def _queue(self, chat_id: int | str) -> _ChatQueue:
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = _ChatQueue(TokenBucket(self.rate, self.burst))
+        return queue
+
+    async def send(self, chat_id: int | str, text: str, entities: list[MessageEntity] | None = None, **kwargs):
+        """
+        发送或排队一条消息
+        """
+        queue = self._queue(chat_id)
+        item = (text, list(entities or []), kwargs)
+        if not queue.pending and time.monotonic() >= queue.retry_at and queue.bucket.try_acquire():
+            try:
+                await self._deliver(chat_id, *item)
+                return
+            except RetryAfter as e:
+                self._rate_limited(queue, e)
+
+        queue.pending.append(item)
+        self.stats["deferred"] += 1
+        if queue.task is None or queue.task.done():
+            queue.task = asyncio.get_running_loop().create_task(self._drain(chat_id, queue))
+
+    async def _deliver(self, chat_id: int | str, text: str, entities: list[MessageEntity], kwargs: dict[str, Any]):
+        await self._sender(chat_id=chat_id, text=text, entities=entities or None, **kwargs)
+        self.stats["sent"] += 1
+
+    def _rate_limited(self, queue: _ChatQueue, error: RetryAfter):
+        retry_after = error.retry_after
+        seconds = retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+        queue.retry_at = time.monotonic() + seconds
+        queue.bucket.block(seconds)
+        self.stats["rate_limited"] += 1
+        self.logger.warning(f"Telegram 限流，{seconds:.1f} 秒后重试")
+
+    async def _drain(self, chat_id: int | str, queue: _ChatQueue):
+        """
+        合并并发送排队中的消息
+        """
+        while queue.pending:
+            delay = max(min(queue.bucket.wait_time(), self.max_delay), queue.retry_at - time.monotonic())
+            if delay > 0: await asyncio.sleep(delay)
+
+            batch, queue.pending = queue.pending, []
+            messages = self.merge(batch)
+            self.stats["merged"] += len(batch) - len(messages)
+            for i, message in enumerate(messages):
+                queue.bucket.consume()
+                try:
+                    await self._deliver(chat_id, *message)
+                except RetryAfter as e:
+                    self._rate_limited(queue, e)
+                    queue.pending[:0] = messages[i:]
+                    break
+                except Exception as e:
+                    self.logger.error(f"发送排队消息失败：{e}")
+
+    @staticmethod
+    def merge(batch: list[tuple[str, list[MessageEntity], dict[str, Any]]]) -> list[tuple[str, list[MessageEntity], dict[str, Any]]]:
+        """
+        把相邻的普通消息合并为一条，并修正实体偏移量
+        """
+        result: list[tuple[str, list[MessageEntity], dict[str, Any]]] = []
+        for text, entities, kwargs in batch:
+            if result and not kwargs and not result[-1][2]:
+                last_text, last_entities, _ = result[-1]
+                shift = utf16_len(last_text) + 1
+                if shift + utf16_len(text) <= MessageLimit.MAX_TEXT_LENGTH:
+                    shifted = [MessageEntity.de_json({**e.to_dict(), "offset": e.offset + shift}, None) for e in entities]
+                    result[-1] = (f"{last_text}\n{text}", last_entities + shifted, {}) # type: ignore
+                    continue
+            result.append((text, entities, kwargs))
+        return result
+
+    def configure(self, rate: float, burst: int, max_delay: float):
+        """
+        更新限流参数，已有聊天的令牌桶一并更新
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_delay = max_delay
+        for queue in self._chats.values():
+            queue.bucket.rate = rate
+            queue.bucket.capacity = burst
+
+    async def close(self, timeout: float = 5):
+        """
+        最多等待 timeout 秒发出排队中的消息，然后取消仍未完成的发送任务；需要在事件循环中调用
+        """
+        tasks = [queue.task for queue in self._chats.values() if queue.task is not None and not queue.task.done()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+            for task in tasks: task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        dropped = self.pending
+        if dropped: self.logger.warning(f"关闭发送队列时丢弃了 {dropped} 条未发出的消息")
+        self._chats.clear()
@@ -0,0 +1,80 @@
+from typing import Any, Callable, Iterable
+
+# 聊天范围：私聊、配置的群聊、其他群聊与游戏内（!!tg）
+PRIVATE = "private"
+GROUP = "group"
+OTHER = "other"
+GAME = "game"
+SCOPES = (PRIVATE, GROUP, OTHER, GAME)
+
+ADMIN = "admin"
+USER = "user"
+
+# 全部权限，"*" 会展开为这些权限
+PERMISSIONS = (
+    "chat", "mc", "list", "bind", "bind.manage", "bind.query", "whitelist", "whitelist.manage",
+    "command", "help", "ping", "server", "info", "reload", "ban", "bot-ban", "save", "export", "stats", "tg",
+)
+
+def requires(permission: str) -> Callable[[Callable], Callable]:
+    """
+    标记命令处理器需要的权限，分发时据此检查
+    """
+    def decorator(func: Callable) -> Callable:
+        func.permission = permission # type: ignore
+        return func
+    return decorator
+
+def scope_of(private: bool, chat_id: int, group: int) -> str:
+    if private: return PRIVATE
+    return GROUP if chat_id == group else OTHER
+
+class PermissionTable:
+    """
+    由角色与授权配置编译出的查找表，配置变更时重新构建
+
+    每个用户只有一个角色：admins 中的账号为 admin，其次为 roles 中按顺序首个包含该用户的角色，其余为 user；
+    grants 为 {角色: {权限: [范围]}}，权限可以写 "*" 表示全部，单独列出的权限覆盖 "*" 的范围
+    """
+    def __init__(self, admins: Iterable[int | str], roles: dict[str, list[int | str]], grants: dict[str, dict[str, list[str]]]):
+        self.members: dict[int, str] = {}
+        for role, ids in roles.items():
+            for id in ids: self.members.setdefault(int(id), role)
+        for id in admins: self.members[int(id)] = ADMIN
+
+        # (角色, 范围, 权限)
+        self.allowed: set[tuple[str, str, str]] = set()
+        # (角色, 范围)：该角色在此范围内至少拥有一项权限
+        self.reachable: set[tuple[str, str]] = set()
+        self.unknown: list[str] = []
+        for role, table in grants.items():
+            expanded = {permission: table["*"] for permission in PERMISSIONS} if "*" in table else {}
+            for permission, scopes in table.items():
+                if permission == "*": continue
+                if permission not in PERMISSIONS:
+                    self.unknown.append(f"{role}: {permission}")
+                    continue
+                expanded[permission] = scopes
+            for permission, scopes in expanded.items():
+                for scope in scopes:
+                    if scope not in SCOPES:
+                        self.unknown.append(f"{role}: {permission}@{scope}")
+                        continue
+                    self.allowed.add((role, scope, permission))
+                    self.reachable.add((role, scope))
+
+    @classmethod
+    def from_config(cls, admins: Iterable[int | str], config: dict[str, Any]) -> "PermissionTable":
+        return cls(admins, config.get("roles", {}), config.get("grants", {}))
+
+    def role_of(self, user_id: int | str) -> str:
+        return self.members.get(int(user_id), USER)
+
+    def allows(self, role: str, scope: str, permission: str) -> bool:
+        return (role, scope, permission) in self.allowed
+
+    def check(self, user_id: int | str, scope: str, permission: str) -> bool:
+        return (self.role_of(user_id), scope, permission) in self.allowed
+
+    def can_reach(self, role: str, scope: str) -> bool:
+        return (role, scope) in self.reachable
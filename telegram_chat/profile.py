@@ -0,0 +1,131 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+
+MOJANG_PROFILE_API = "https://api.mojang.com/users/profiles/minecraft/{}"
+
+class ProfileResolver:
+    """
+    异步查询正版玩家档案
+
+    结果（包括“不存在”）按 TTL 缓存，超出 maxsize 时淘汰最久未使用的条目；
+    同一玩家的并发查询只会发出一次请求
+    """
+    def __init__(self, endpoint: str = MOJANG_PROFILE_API, ttl: float = 3600,
+                 negative_ttl: float = 300, maxsize: int = 1024, timeout: float = 10):
+        self.endpoint = endpoint
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._cache: OrderedDict[str, tuple[float, bool, str | None]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        # 第一次查询时在当前事件循环上创建，之后复用连接
+        self._client: "httpx.AsyncClient | None" = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def resolve(self, player: str) -> tuple[bool, str | None]:
+        """
+        查询玩家档案是否存在，返回 (是否存在, 错误信息)
+
+        超时（或合并的查询被取消）时抛出 TimeoutError
+        """
+        key = player.lower()
+        cached = self._cache.get(key)
+        if cached is not None:
+            expires, exists, error = cached
+            if expires > time.monotonic():
+                self._cache.move_to_end(key)
+                return exists, error
+            del self._cache[key]
+
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._fetch(player)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # 只取消发起查询的调用者，其他等待同一玩家的调用者收到普通错误，可以重试
+            future.set_exception(TimeoutError("Profile lookup was cancelled."))
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免“exception was never retrieved”警告
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _fetch(self, player: str) -> tuple[bool, str | None]:
+        import httpx # 只有验证玩家时才用到
+        if self._loop is not asyncio.get_running_loop():
+            # 重建 Bot 后换了事件循环，旧的客户端不能再用
+            self.close()
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+            self._loop = asyncio.get_running_loop()
+        try:
+            response = await self._client.get(self.endpoint.format(player))
+        except httpx.TimeoutException as e:
+            raise TimeoutError(str(e)) from e
+
+        if response.status_code == 200:
+            self._store(player, True, None)
+            return True, None
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        error = body.get("errorMessage") if isinstance(body, dict) else None
+        error = error or f"HTTP {response.status_code}"
+        # 只缓存确定的“不存在”，限流或服务端错误下次重新查询
+        if response.status_code in (204, 404):
+            self._store(player, False, error)
+        return False, error
+
+    def configure(self, endpoint: str, ttl: float, negative_ttl: float):
+        """
+        更新查询接口与缓存时间，接口变化时清空缓存，否则保留已缓存的结果
+        """
+        if endpoint != self.endpoint: self._cache.clear()
+        self.endpoint = endpoint
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    def _store(self, player: str, exists: bool, error: str | None):
+        ttl = self.ttl if exists else self.negative_ttl
+        if ttl <= 0: return
+        self._cache[player.lower()] = (time.monotonic() + ttl, exists, error)
+        self._cache.move_to_end(player.lower())
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def close(self):
+        """
+        关闭 HTTP 客户端
+
+        在客户端所在的事件循环上调用时只安排关闭；在其他线程调用时等待关闭完成，事件循环已停止时直接丢弃
+        """
+        client, loop = self._client, self._loop
+        self._client = self._loop = None
+        if client is None or loop is None or loop.is_closed() or not loop.is_running(): return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(client.aclose())
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=5)
+        except Exception: ...
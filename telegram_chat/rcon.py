@@ -0,0 +1,80 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+from mcdreforged.api.types import PluginServerInterface
+
+class RconExecutor:
+    """
+    在独立线程池中执行 RCON 查询，避免阻塞 Bot 的事件循环
+
+    只读命令（完全匹配 read_only）在 cache_ttl 秒内复用结果，并发的相同查询只执行一次；
+    其他命令视为写操作，执行后清空缓存
+    """
+    def __init__(self, workers: int = 2, timeout: float = 10, cache_ttl: float = 2.0, read_only: Iterable[str] = ()):
+        self.workers = workers
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.read_only = frozenset(read_only)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="TelegramChat-RCON")
+        self._cache: dict[str, tuple[float, str | None]] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        # invalidate() 时递增，开始于旧一代的查询结果不再写入缓存
+        self._generation = 0
+
+    async def query(self, server: PluginServerInterface, command: str) -> str | None:
+        """
+        执行 RCON 命令，超时抛出 asyncio.TimeoutError
+        """
+        command = command.strip()
+        if command not in self.read_only:
+            try:
+                return await self._run(server, command)
+            finally:
+                self.invalidate()
+
+        cached = self._cache.get(command)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        future = self._inflight.get(command)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        generation = self._generation
+        future = self._inflight[command] = asyncio.ensure_future(self._run(server, command))
+        try:
+            result = await asyncio.shield(future)
+            if self.cache_ttl > 0 and generation == self._generation:
+                self._cache[command] = (time.monotonic() + self.cache_ttl, result)
+            return result
+        finally:
+            if self._inflight.get(command) is future: del self._inflight[command]
+
+    async def _run(self, server: PluginServerInterface, command: str) -> str | None:
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(self._pool, server.rcon_query, command), self.timeout)
+
+    def invalidate(self):
+        """
+        清空只读命令的结果缓存，尚未完成的查询也不再被复用或缓存
+        """
+        self._generation += 1
+        self._cache.clear()
+        self._inflight.clear()
+
+    def configure(self, workers: int, timeout: float, cache_ttl: float, read_only: Iterable[str]):
+        """
+        更新参数；线程数变化时换用新的线程池，旧线程池上正在执行的查询照常完成
+        """
+        if workers != self.workers:
+            old, self._pool = self._pool, ThreadPoolExecutor(max_workers=workers, thread_name_prefix="TelegramChat-RCON")
+            old.shutdown(wait=False)
+            self.workers = workers
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.read_only = frozenset(read_only)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
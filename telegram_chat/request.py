@@ -0,0 +1,51 @@
+from mcdreforged.api.types import PluginServerInterface
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from . import tools
+from .commands.types import ChatType
+from .config import ConfigManager
+from .permissions import scope_of
+
+class Request:
+    """
+    一条消息的处理上下文，收到 Update 时计算一次，随后传给所有命令处理器
+    """
+    __slots__ = ("server", "event", "context", "user_id", "chat_id", "chat_type",
+                 "is_admin", "is_banned", "player", "role", "scope")
+
+    def __init__(self, server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE):
+        self.server = server
+        self.event = event
+        self.context = context
+        self.user_id = tools.get_id(event)
+        self.chat_id = event.message.chat.id # type: ignore
+        self.chat_type = tools.get_type(event)
+        self.is_admin = ConfigManager.is_admin(self.user_id)
+        self.is_banned = ConfigManager.is_banned(self.user_id)
+        self.player = ConfigManager.bindings.get(self.user_id)
+        self.role = ConfigManager.permissions.role_of(self.user_id)
+        self.scope = None if self.chat_type == ChatType.OTHER else scope_of(
+            self.chat_type == ChatType.PRIVATE, self.chat_id, ConfigManager.config.group)
+
+    def can(self, permission: str) -> bool:
+        return self.scope is not None and ConfigManager.permissions.allows(self.role, self.scope, permission)
+
+    def can_reach(self) -> bool:
+        """
+        在当前聊天中是否拥有任何权限，没有时整条消息都不处理
+        """
+        return self.scope is not None and ConfigManager.permissions.can_reach(self.role, self.scope)
+
+    async def reply(self, message: str, at_sender: bool = True):
+        """
+        回复这条消息
+        """
+        await tools.send_to(self.event, self.context, message, at_sender)
+
+    async def execute(self, command: str):
+        """
+        通过 RCON 执行控制台命令并回复结果
+        """
+        await tools.execute(self.server, self.event, self.context, command)
@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import Callable, Iterable
+
+class Roster:
+    """
+    在线玩家列表
+
+    由加入/离开事件增量维护，每隔 sync_interval 秒与 online_player_api 校对一次；
+    /list 的回复文本按版本缓存
+    """
+    def __init__(self, fetch: Callable[[], Iterable[str]], sync_interval: float = 60, dedup_window: float = 3):
+        self.fetch = fetch
+        self.sync_interval = sync_interval
+        self.dedup_window = dedup_window
+        self.version = 0
+        self._players: dict[str, None] = {}
+        self._lock = threading.Lock()
+        self._synced = 0.0
+        self._rendered: tuple[int, str] = (-1, "")
+        self._replied: dict[int, tuple[float, int]] = {}
+
+    def join(self, player: str):
+        with self._lock:
+            if player not in self._players:
+                self._players[player] = None
+                self.version += 1
+
+    def leave(self, player: str):
+        with self._lock:
+            if self._players.pop(player, 0) is None:
+                self.version += 1
+
+    def clear(self):
+        with self._lock:
+            if self._players:
+                self._players.clear()
+                self.version += 1
+
+    def sync(self, force: bool = False):
+        """
+        与 online_player_api 校对
+        """
+        now = time.monotonic()
+        if not force and now - self._synced < self.sync_interval: return
+        players = list(self.fetch())
+        with self._lock:
+            self._synced = now
+            if list(self._players) != players:
+                self._players = dict.fromkeys(players)
+                self.version += 1
+
+    def render(self) -> str:
+        self.sync()
+        version, text = self._rendered
+        if version == self.version: return text
+
+        with self._lock:
+            version, players = self.version, list(self._players)
+        message = f"服务器目前有 {len(players)} 个玩家在线~"
+        if players:
+            message += "\n=== 玩家列表 ===\n" + "".join(f"{player}\n" for player in players)
+        self._rendered = (version, message)
+        return message
+
+    def should_reply(self, chat_id: int) -> bool:
+        """
+        同一聊天在 dedup_window 秒内、列表未变化时的重复请求不再回复
+        """
+        now = time.monotonic()
+        last = self._replied.get(chat_id)
+        if last is not None and now - last[0] < self.dedup_window and last[1] == self.version:
+            return False
+        self._replied[chat_id] = (now, self.version)
+        if len(self._replied) > 1024:
+            self._replied = {k: v for k, v in self._replied.items() if now - v[0] < self.dedup_window}
+        return True
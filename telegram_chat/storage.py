@@ -0,0 +1,204 @@
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from mcdreforged.api.types import PluginServerInterface
+
+class Storage(ABC):
+    """
+    绑定数据与封禁列表的存储后端
+    """
+    @abstractmethod
+    def load(self) -> tuple[dict[str, str], list[int]]: ...
+
+    @abstractmethod
+    def set_binding(self, id: int, player: str): ...
+
+    @abstractmethod
+    def remove_binding(self, id: int): ...
+
+    @abstractmethod
+    def add_ban(self, id: int): ...
+
+    @abstractmethod
+    def remove_ban(self, id: int): ...
+
+    @abstractmethod
+    def save_all(self, bindings: dict[str, str], ban_list: list[int]):
+        """
+        用给定的数据整体覆盖存储内容
+        """
+
+    def close(self): ...
+
+def is_valid_id(id: object) -> bool:
+    try:
+        int(id) # type: ignore
+        return True
+    except (TypeError, ValueError):
+        return False
+
+def sanitize(bindings: dict[str, str], ban_list: list[int], logger: logging.Logger) -> tuple[dict[str, str], list[int]]:
+    """
+    去掉不是整数的 Telegram ID（旧版 /bind 可能保存空字符串等），并记录警告
+    """
+    invalid = [id for id in bindings if not is_valid_id(id)] + [id for id in ban_list if not is_valid_id(id)]
+    if not invalid: return bindings, ban_list
+    logger.warning(f"忽略 {len(invalid)} 条 Telegram ID 无效的记录：{', '.join(repr(id) for id in invalid)}")
+    return ({id: player for id, player in bindings.items() if is_valid_id(id)},
+            [id for id in ban_list if is_valid_id(id)])
+
+def load_json(server: PluginServerInterface) -> tuple[dict[str, str], list[int]]:
+    bindings = server.load_config_simple(
+        "bindings.json",
+        default_config={"data": {}},
+        echo_in_console=False
+    )["data"]
+    ban_list = server.load_config_simple(
+        "ban_list.json",
+        default_config={"data": []},
+        echo_in_console=False
+    )["data"]
+    return bindings, ban_list
+
+def save_json(server: PluginServerInterface, bindings: dict[str, str], ban_list: list[int]):
+    server.save_config_simple(
+        {
+            "data": bindings,
+        },
+        "bindings.json"
+    )
+    server.save_config_simple(
+        {
+            "data": ban_list,
+        },
+        "ban_list.json"
+    )
+
+class JsonStorage(Storage):
+    """
+    旧版 JSON 文件存储，每次修改都会重写全部文件
+    """
+    def __init__(self, server: PluginServerInterface):
+        self.server = server
+        self._bindings: dict[str, str] = {}
+        self._ban_list: list[int] = []
+
+    def load(self) -> tuple[dict[str, str], list[int]]:
+        self._bindings, self._ban_list = sanitize(*load_json(self.server), self.server.logger)
+        return dict(self._bindings), list(self._ban_list)
+
+    def set_binding(self, id: int, player: str):
+        self._bindings[str(id)] = player
+        self._flush()
+
+    def remove_binding(self, id: int):
+        self._bindings.pop(str(id), None)
+        self._flush()
+
+    def add_ban(self, id: int):
+        if id not in self._ban_list: self._ban_list.append(id)
+        self._flush()
+
+    def remove_ban(self, id: int):
+        if id in self._ban_list: self._ban_list.remove(id)
+        self._flush()
+
+    def save_all(self, bindings: dict[str, str], ban_list: list[int]):
+        self._bindings, self._ban_list = dict(bindings), list(ban_list)
+        self._flush()
+
+    def _flush(self):
+        save_json(self.server, self._bindings, self._ban_list)
+
+class SqliteStorage(Storage):
+    """
+    SQLite（WAL 模式）存储，每次修改只写入一行
+    """
+    def __init__(self, server: PluginServerInterface, path: str):
+        self.server = server
+        self.path = path
+        self._lock = threading.Lock()
+        # 处理器运行在 Bot 线程，加载与保存可能在 MCDR 线程，由 _lock 保证串行访问
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._transaction():
+            self._conn.execute("CREATE TABLE IF NOT EXISTS bindings (tg_id INTEGER PRIMARY KEY, player TEXT NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS ban_list (tg_id INTEGER PRIMARY KEY)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _execute(self, sql: str, params: tuple):
+        with self._lock, self._transaction():
+            self._conn.execute(sql, params)
+
+    def migrate(self):
+        """
+        首次使用时从 JSON 文件导入数据
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone()
+        if row is not None: return False
+
+        bindings, ban_list = sanitize(*load_json(self.server), self.server.logger)
+        self.save_all(bindings, ban_list)
+        self._execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', '1')", ())
+        self.server.logger.info(f"已从 JSON 文件迁移 {len(bindings)} 条绑定与 {len(ban_list)} 条封禁记录")
+        return True
+
+    def load(self) -> tuple[dict[str, str], list[int]]:
+        self.migrate()
+        with self._lock:
+            bindings = {str(id): player for id, player in self._conn.execute("SELECT tg_id, player FROM bindings")}
+            ban_list = [id for id, in self._conn.execute("SELECT tg_id FROM ban_list")]
+        return bindings, ban_list
+
+    def set_binding(self, id: int, player: str):
+        self._execute("INSERT OR REPLACE INTO bindings (tg_id, player) VALUES (?, ?)", (int(id), player))
+
+    def remove_binding(self, id: int):
+        self._execute("DELETE FROM bindings WHERE tg_id = ?", (int(id),))
+
+    def add_ban(self, id: int):
+        self._execute("INSERT OR IGNORE INTO ban_list (tg_id) VALUES (?)", (int(id),))
+
+    def remove_ban(self, id: int):
+        self._execute("DELETE FROM ban_list WHERE tg_id = ?", (int(id),))
+
+    def save_all(self, bindings: dict[str, str], ban_list: list[int]):
+        bindings, ban_list = sanitize(bindings, ban_list, self.server.logger)
+        with self._lock, self._transaction():
+            self._conn.execute("DELETE FROM bindings")
+            self._conn.executemany("INSERT INTO bindings (tg_id, player) VALUES (?, ?)",
+                                   ((int(id), player) for id, player in bindings.items()))
+            self._conn.execute("DELETE FROM ban_list")
+            self._conn.executemany("INSERT OR IGNORE INTO ban_list (tg_id) VALUES (?)", ((int(id),) for id in ban_list))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def create_storage(server: PluginServerInterface, backend: str) -> Storage:
+    """
+    根据配置创建存储后端
+    """
+    match backend:
+        case "sqlite":
+            return SqliteStorage(server, os.path.join(server.get_data_folder(), "data.db"))
+        case "json":
+            return JsonStorage(server)
+        case _:
+            raise ValueError(f"Unknown storage backend: {backend}")
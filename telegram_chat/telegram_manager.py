@@ -1,89 +1,323 @@
 import asyncio
+import concurrent.futures
 import logging
+import secrets
 import threading
 import time
-from typing import Callable
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Coroutine
 
 from telegram import Bot, Update
 from telegram.ext import Application, ApplicationBuilder, filters, MessageHandler
 
-class TelegramBot:
-    action: Callable
-    application: Application
+from .http_pool import MeteredRequest
+from .metrics import metrics
+from .updates import OrderedUpdateProcessor
+from .webhook import WebhookServer
+
+class LoopThread(ABC):
+    """
+    在独立线程的事件循环上运行服务，MCDR 线程通过 submit() 把协程交给它执行
+    """
+    name: str = "Event loop"
     bot_thread: threading.Thread
     loop: asyncio.AbstractEventLoop
     logger: logging.Logger
-    stop_sign: threading.Event
+    ready: concurrent.futures.Future
+    stop_sign: asyncio.Event
     
     _timeout: int = 60
-    
-    @property
-    def bot(self) -> Bot:
-        return self.application.bot
 
-    def __init__(self, logger: logging.Logger, token: str, api: str = "https://api.telegram.org/bot", timeout: int = 60):
-        self.application = ApplicationBuilder().base_url(api).token(token).build()
-        self.stop_sign = threading.Event()
+    def __init__(self, logger: logging.Logger, timeout: int = 60, max_pending: int = 1000):
+        self.stop_sign = asyncio.Event()
         self.logger = logger
         self.loop = asyncio.new_event_loop()
         self._timeout = timeout
+        # 其他线程提交到事件循环、尚未完成的协程数量上限
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._max_pending = max_pending
+        # 在事件循环中等待就绪（无论成功与否）
+        self._ready_sign = asyncio.Event()
+        self._started_at = 0.0
+        # 后台启动失败、正在等待重试时为最近一次的错误
+        self.startup_error: BaseException | None = None
+        self._retry_startup = True
 
-    def register(self):
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future | None:
         """
-        注册命令处理器
+        把协程交给事件循环执行，立即返回 Future
+
+        不会阻塞调用者：待执行的协程已达 max_pending 时直接丢弃并返回 None
         """
-        self.application.handlers.clear()
-        normal_handler = MessageHandler(filters.ALL, self.action)
-        self.application.add_handler(normal_handler)
-            
+        if self.loop.is_closed():
+            coro.close()
+            return None
+        if self._on_loop_thread():
+            # 已经在事件循环线程上，无需排队，也不能阻塞
+            future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        elif self._pending.acquire(blocking=False):
+            future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+            future.add_done_callback(lambda _: self._pending.release())
+        else:
+            coro.close()
+            metrics.inc("telegram_chat_bot_dropped_calls_total")
+            self.logger.warning("Too many pending Telegram calls, dropping one.")
+            return None
+
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @property
+    def pending(self) -> int:
+        """
+        其他线程提交、尚未完成的协程数量
+        """
+        return self._max_pending - self._pending._value # type: ignore
+
+    def _on_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _log_failure(self, future: concurrent.futures.Future):
+        if not future.cancelled() and future.exception() is not None:
+            self.logger.error(f"Telegram call failed: {future.exception()}")
+
+    def _set_ready(self, error: BaseException | None = None):
+        if self.ready.done(): return
+        if error is None: self.ready.set_result(None)
+        else: self.ready.set_exception(error)
+        self._ready_sign.set()
+
+    async def wait_ready(self):
+        """
+        在事件循环中等待启动完成，启动失败（包括正在等待重试）时抛出异常
+        """
+        if not self._ready_sign.is_set() and self.startup_error is not None:
+            raise RuntimeError(f"{self.name} is not running, retrying startup: {self.startup_error}")
+        await self._ready_sign.wait()
+        error = self.ready.exception()
+        if error is not None: raise RuntimeError(f"{self.name} is not running: {error}")
+
     def start(self, wait_until_connected: bool = False):
         """
-        启动机器人
+        启动事件循环线程
+
+        不等待时在后台连接，就绪前提交的发送会在 wait_ready() 处排队，连接失败时按退避间隔重试；
+        等待时连接失败直接抛出异常
         """
-        self.bot_thread = threading.Thread(target=self._start_check_thread, daemon=True)
+        self.ready = concurrent.futures.Future()
+        self._retry_startup = not wait_until_connected
+        self._started_at = time.perf_counter()
+        self.bot_thread = threading.Thread(target=self._run_loop, name="TelegramBot", daemon=True)
         self.bot_thread.start()
         
         if wait_until_connected:
-            start_time = time.time()
-            while True:
-                if self.application.running:
-                    break
-                if time.time() - start_time > self._timeout:
-                    raise Exception("Unable to start Telegram bot.")
-                time.sleep(0.5)
-        self.logger.info("Telegram bot started.")
+            try:
+                self.ready.result(timeout=self._timeout)
+            except concurrent.futures.TimeoutError:
+                self.stop()
+                raise Exception(f"Unable to start {self.name}.")
+            except Exception as e:
+                self.stop()
+                raise Exception(f"Unable to start {self.name}: {e}") from e
+            self.logger.info(f"{self.name} started.")
+        else:
+            self.ready.add_done_callback(self._log_ready)
+
+    def _log_ready(self, future: concurrent.futures.Future):
+        if future.exception() is None:
+            self.logger.info(f"{self.name} started in {(time.perf_counter() - self._started_at) * 1000:.0f}ms.")
     
     def stop(self):
         """
-        停止机器人
+        停止事件循环线程
         """
-        asyncio.set_event_loop(self.loop)
-        if not self.application.running: return
-        
-        self.stop_sign.set()
-        if self.bot_thread.is_alive():
-            self.bot_thread.join(timeout=5)
-        self.stop_sign.clear()
-        self.logger.info("Telegram bot stopped.")
+        if not self.bot_thread.is_alive(): return
         
-    def _stop_check(self):
+        self.loop.call_soon_threadsafe(self.stop_sign.set)
+        if threading.current_thread() is self.bot_thread: return
+        self.bot_thread.join(timeout=self._timeout)
+        self.logger.info(f"{self.name} stopped.")
+    
+    def _run_loop(self):
         """
-        检查线程
+        事件循环线程：运行 _serve() 直到收到停止信号
         """
         asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._serve())
+        finally:
+            # 取消仍在排队的发送任务等，避免事件循环关闭后残留
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks: task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    @abstractmethod
+    async def _serve(self):
+        """
+        启动服务，就绪时设置 ready，等待 stop_sign 后清理
+        """
+
+class TelegramBot(LoopThread):
+    name = "Telegram bot"
+    action: Callable
+    application: Application
+    webhook_server: WebhookServer | None = None
+    update_processor: OrderedUpdateProcessor | None = None
+    requests: list[MeteredRequest]
+    _max_retry_delay: float = 300
+    
+    @property
+    def bot(self) -> Bot:
+        return self.application.bot
+
+    def __init__(self, logger: logging.Logger, token: str, api: str = "https://api.telegram.org/bot", timeout: int = 60,
+                 max_pending: int = 1000, webhook: dict[str, Any] | None = None, concurrent_updates: int = 1,
+                 drop_pending_updates: bool = False, http: dict[str, Any] | None = None):
+        super().__init__(logger, timeout, max_pending)
+        http = http or {}
+        # 长轮询单独使用一个连接池，不与发送等调用争抢连接
+        self.requests = [
+            self._create_request("api", http, http.get("pool_size", 64)),
+            self._create_request("get_updates", http, http.get("get_updates_pool_size", 1)),
+        ]
+        builder = (ApplicationBuilder().base_url(api).token(token)
+                   .request(self.requests[0]).get_updates_request(self.requests[1]))
+        if concurrent_updates > 1:
+            # 不同聊天的 Update 并发处理，同一聊天、同一用户内保持顺序
+            self.update_processor = OrderedUpdateProcessor(concurrent_updates)
+            builder = builder.concurrent_updates(self.update_processor)
+        self.application = builder.build()
+        self._webhook = webhook or {}
+        # 轮询时让 Telegram 直接丢弃积压的 Update，不再拉取
+        self._drop_pending_updates = drop_pending_updates
+
+    def _create_request(self, pool: str, http: dict[str, Any], size: int) -> MeteredRequest:
+        kwargs = {
+            "connection_pool_size": size,
+            "connect_timeout": http.get("connect_timeout", 5),
+            "read_timeout": http.get("read_timeout", 5),
+            "write_timeout": http.get("write_timeout", 5),
+            "pool_timeout": http.get("pool_timeout", 3),
+            "keepalive_connections": http.get("keepalive_connections", 20),
+            "keepalive_expiry": http.get("keepalive_expiry", 30),
+        }
+        if http.get("http2"):
+            try:
+                return MeteredRequest(pool, http_version="2", **kwargs)
+            except RuntimeError as e:
+                self.logger.warning(f"HTTP/2 is not available, falling back to HTTP/1.1. Error: {e}")
+        return MeteredRequest(pool, **kwargs)
+
+    def register(self):
+        """
+        注册命令处理器
+        """
+        self.application.handlers.clear()
+        normal_handler = MessageHandler(filters.ALL, self.action)
+        self.application.add_handler(normal_handler)
+    
+    async def _serve(self):
+        """
+        初始化并开始轮询，就绪时立即通知 start()，收到停止信号后依次关闭轮询与 HTTP 连接池
+
+        启动过程中收到停止信号时直接放弃启动，避免重载插件时等待连接超时；
+        后台启动失败时每次间隔加倍（最多 _max_retry_delay 秒）重试，直到成功或收到停止信号
+        """
+        stopping = asyncio.ensure_future(self.stop_sign.wait())
+        delay = 1.0
         while True:
-            if self.stop_sign.is_set():
-                self.loop.stop()
-                return
-            time.sleep(1)
+            startup = asyncio.ensure_future(self._startup())
+            await asyncio.wait((startup, stopping), return_when=asyncio.FIRST_COMPLETED)
+            if not startup.done():
+                startup.cancel()
+                await asyncio.gather(startup, return_exceptions=True)
+                self._set_ready(Exception("Stopped before startup finished."))
+                break
+            error = startup.exception()
+            if error is None:
+                self.startup_error = None
+                self._set_ready()
+                await stopping
+                break
+            if not self._retry_startup:
+                self.logger.error(f"Failed to start Telegram bot! Error: {error}")
+                self._set_ready(error)
+                break
+            self.startup_error = error
+            self.logger.error(f"Failed to start Telegram bot, retrying in {delay:.0f}s. Error: {error}")
+            await self._shutdown()
+            await asyncio.wait((stopping,), timeout=delay)
+            if stopping.done():
+                self._set_ready(error)
+                break
+            delay = min(delay * 2, self._max_retry_delay)
+        stopping.cancel()
+        await self._shutdown()
+
+    async def _startup(self):
+        application = self.application
+        await application.initialize()
+        if not await self._start_webhook():
+            await application.updater.start_polling( # type: ignore
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=self._drop_pending_updates
+            )
+        await application.start()
     
-    def _start_check_thread(self):
+    async def _start_webhook(self) -> bool:
         """
-        启动检查线程
+        按配置启动 Webhook 接收器，失败时返回 False 以回退到轮询
         """
+        if not self._webhook.get("enabled"): return False
+        application = self.application
+        secret_token = self._webhook.get("secret_token")
+        if not secret_token:
+            if not self._webhook.get("url"):
+                # setWebhook 由外部调用时无法得知密钥，不能不加验证地接受推送
+                self.logger.warning("Webhook requires secret_token when url is not set, falling back to polling.")
+                return False
+            # 由本插件调用 setWebhook 时自动生成密钥
+            secret_token = secrets.token_urlsafe(32)
+        try:
+            self.webhook_server = WebhookServer(
+                self.logger,
+                application.bot,
+                application.update_queue.put,
+                listen=self._webhook.get("listen", "127.0.0.1"),
+                port=self._webhook.get("port", 8443),
+                path=self._webhook.get("path", "/telegram"),
+                secret_token=secret_token
+            )
+            await self.webhook_server.start()
+            if self._webhook.get("url"):
+                await application.bot.set_webhook(
+                    url=self._webhook["url"],
+                    secret_token=secret_token,
+                    allowed_updates=Update.ALL_TYPES,
+                    drop_pending_updates=self._drop_pending_updates
+                )
+            return True
+        except Exception as e:
+            self.logger.warning(f"Failed to start webhook, falling back to polling. Error: {e}")
+            if self.webhook_server is not None:
+                await self.webhook_server.stop()
+                self.webhook_server = None
+            return False
+    
+    async def _shutdown(self):
+        application = self.application
         try:
-            asyncio.set_event_loop(self.loop)
-            threading.Thread(target=self._stop_check, daemon=True).start()
-            self.application.run_polling(allowed_updates=Update.ALL_TYPES, stop_signals=None)
+            if self.webhook_server is not None:
+                await self.webhook_server.stop()
+                self.webhook_server = None
+            if application.updater is not None and application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+            await application.shutdown()
         except Exception as e:
-            self.logger.error(f"Failed to start Telegram bot! Error: {e}")
\ No newline at end of file
+            self.logger.error(f"Failed to stop Telegram bot cleanly! Error: {e}")
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from typing import Any
+
+from .outbound import TokenBucket
+
+class Throttle:
+    """
+    命令限流：按用户、聊天、用户+命令三个维度分别维护令牌桶
+
+    管理员的速率与容量乘以 admin_multiplier；桶按最近使用顺序保存，
+    超出 max_entries 时淘汰最久未使用的桶（长时间未使用的桶本来就是满的，淘汰不影响结果）
+    """
+    def __init__(self, user: dict[str, float], chat: dict[str, float], commands: dict[str, dict[str, float]],
+                 admin_multiplier: float = 4, max_wait: float = 0, max_entries: int = 10000):
+        self.user = user
+        self.chat = chat
+        self.commands = commands
+        self.admin_multiplier = admin_multiplier
+        self.max_wait = max_wait
+        self.max_entries = max_entries
+        self._buckets: OrderedDict[tuple[Any, ...], TokenBucket] = OrderedDict()
+        self.stats: dict[str, int] = {
+            "allowed": 0,
+            "delayed": 0,
+            "dropped": 0,
+        }
+
+    def _bucket(self, key: tuple[Any, ...], limits: dict[str, float], scale: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(limits["rate"] * scale, limits["burst"] * scale)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            # 热重载后限额可能已变化，保留令牌数量
+            bucket.rate = limits["rate"] * scale
+            bucket.capacity = limits["burst"] * scale
+        return bucket
+
+    def configure(self, user: dict[str, float], chat: dict[str, float], commands: dict[str, dict[str, float]],
+                  admin_multiplier: float = 4, max_wait: float = 0, max_entries: int = 10000):
+        """
+        更新限额，已有的桶在下次使用时按新限额调整，其中的令牌保留
+        """
+        self.user = user
+        self.chat = chat
+        self.commands = commands
+        self.admin_multiplier = admin_multiplier
+        self.max_wait = max_wait
+        self.max_entries = max_entries
+        while len(self._buckets) > max_entries:
+            self._buckets.popitem(last=False)
+
+    def reserve(self, user_id: int, chat_id: int, command: str, admin: bool = False) -> float | None:
+        """
+        为一次命令请求预留令牌
+
+        返回需要等待的秒数；等待时间超过 max_wait 时不预留并返回 None，表示丢弃该请求
+        """
+        scale = self.admin_multiplier if admin else 1
+        buckets = [
+            self._bucket(("user", user_id), self.user, scale),
+            self._bucket(("chat", chat_id), self.chat, 1),
+        ]
+        limits = self.commands.get(command)
+        if limits is not None:
+            buckets.append(self._bucket(("command", user_id, command), limits, scale))
+
+        wait = max(bucket.wait_time() for bucket in buckets)
+        if wait > self.max_wait:
+            self.stats["dropped"] += 1
+            return None
+        for bucket in buckets: bucket.consume()
+        self.stats["delayed" if wait > 0 else "allowed"] += 1
+        return wait
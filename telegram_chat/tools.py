@@ -1,11 +1,19 @@
+import asyncio
+import concurrent.futures
+from typing import Any, Coroutine
+
 from mcdreforged.api.command import CommandContext
 from mcdreforged.api.types import CommandSource, PluginServerInterface
 
 from telegram import Update
+from telegram.error import RetryAfter, TelegramError
 from telegram.ext import ContextTypes
 
-from .commands.types import ChatType, MessageType
+from .commands.types import ChatType
 from .config import ConfigManager, Config
+from .hub import HubClient
+from .metrics import metrics, timer
+from .tracing import span
 
 def get_type(event: Update) -> ChatType:
     if event.message is None: raise Exception("event.message is none.")
@@ -29,44 +37,89 @@ async def execute(server: PluginServerInterface, event: Update, context: Context
     执行控制台命令
     """
     if server.is_rcon_running():
-        result = server.rcon_query(command)
+        try:
+            with timer("telegram_chat_rcon_duration_seconds"):
+                result = await ConfigManager.rcon.query(server, command)
+        except asyncio.TimeoutError:
+            metrics.inc("telegram_chat_rcon_timeouts_total")
+            await send_to(event, context, "RCON 命令执行超时！")
+            return
         if not result: return
         await send_to(event, context, result)
     else: await send_to(event, context, "请开启 RCON 再执行此操作！")
 
-async def send_to_group(msg: str, **kwargs):
+def submit(coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future | None:
+    """
+    在 Bot 的事件循环上执行协程，供 MCDR 线程中的事件处理器使用
+    """
+    return ConfigManager.bot.submit(coro)
+
+async def send_to_group(msg: str, event: str = "chat", **kwargs):
     """
-    向所有群聊广播
+    向配置的群聊以及订阅了 event 的广播目标并发发送，每个聊天各自限流
+    """
+    if not isinstance(ConfigManager.config, Config): return
+    if isinstance(ConfigManager.bot, HubClient):
+        # 节点模式：交给 hub 广播
+        await ConfigManager.bot.publish(event, msg, kwargs.get("entities"))
+        return
+    targets = ConfigManager.targets.get(event, ())
+    if len(targets) == 1:
+        await ConfigManager.outbound.send(targets[0], msg, **kwargs)
+        return
+
+    limit = asyncio.Semaphore(ConfigManager.config.broadcast["concurrency"])
+    async def send(chat_id: int | str):
+        async with limit:
+            await ConfigManager.outbound.send(chat_id, msg, **kwargs)
+
+    results = await asyncio.gather(*(send(chat_id) for chat_id in targets), return_exceptions=True)
+    for chat_id, result in zip(targets, results):
+        if isinstance(result, Exception):
+            ConfigManager.logger.error(f"向 {chat_id} 广播失败：{result}")
+
+async def send_message(**kwargs):
     """
-    if isinstance(ConfigManager.config, Config):
-        await ConfigManager.bot.bot.send_message(chat_id=ConfigManager.config.group, text=msg, **kwargs)
+    直接调用 Bot API 发送信息
+    """
+    # 后台连接尚未完成时在此排队
+    await ConfigManager.bot.wait_ready()
+    await call_api("sendMessage", ConfigManager.bot.bot.send_message(**kwargs))
+
+async def call_api(method: str, coro: Coroutine[Any, Any, Any]) -> Any:
+    """
+    等待一次 Bot API 调用，并记录耗时、限流与错误次数
+    """
+    with timer("telegram_chat_api_duration_seconds", method=method):
+        try:
+            return await coro
+        except RetryAfter:
+            metrics.inc("telegram_chat_api_rate_limited_total", method=method)
+            raise
+        except TelegramError:
+            metrics.inc("telegram_chat_api_errors_total", method=method)
+            raise
         
 async def send_to(event: Update | CommandSource, context: ContextTypes.DEFAULT_TYPE | CommandContext, message: str, at_sender: bool = True):
     """
     回复信息
     """
-    ConfigManager.logger.debug(f"发送信息：{message}")
+    ConfigManager.logger.debug("发送信息：%s", message)
     if (isinstance(event, Update) and not isinstance(context, CommandContext)
         and event.effective_chat is not None and event.effective_message is not None): # 后面的是保证 IDE 不打波浪线
-        ConfigManager.logger.debug(f"发送到 Telegram，chat_id={event.effective_chat.id}, reply_to_message_id={event.effective_chat.id}")
-        await context.bot.send_message(chat_id=event.effective_chat.id, text=message, reply_to_message_id=event.effective_message.id if at_sender else None)
+        ConfigManager.logger.debug("发送到 Telegram，chat_id=%s, reply_to_message_id=%s", event.effective_chat.id, event.effective_message.id)
+        with span("reply"):
+            await call_api("sendMessage", context.bot.send_message(chat_id=event.effective_chat.id, text=message, reply_to_message_id=event.effective_message.id if at_sender else None))
     elif isinstance(event, CommandSource):
-        ConfigManager.logger.debug(f"发送到 CommandSource。")
+        ConfigManager.logger.debug("发送到 CommandSource。")
         event.reply(message)
 
-def parse_event_type(event: Update) -> MessageType:
-    """
-    处理事件类型
-    """
-    if isinstance(ConfigManager.config, Config):
-        return MessageType.ADMIN if str(get_id(event)) in ConfigManager.config.admins else MessageType.USER
-    raise Exception("Config instance is not initialized or is not of type Config.")
-
 async def add_to_whitelist(server: PluginServerInterface, event: Update, context: ContextTypes.DEFAULT_TYPE, player: str):
     """
     添加到白名单
     """
     server.execute(f"whitelist add {player}")
+    ConfigManager.rcon.invalidate()
     await send_to(
         event,
         context,
@@ -78,6 +131,7 @@ async def remove_from_whitelist(server: PluginServerInterface, event: Update, co
     删除白名单
     """
     server.execute(f"whitelist remove {player}")
+    ConfigManager.rcon.invalidate()
     await send_to(
         event,
         context,
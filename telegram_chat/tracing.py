@@ -0,0 +1,106 @@
+import contextvars
+import json
+import logging
+import random
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Any
+
+class Trace:
+    """
+    一次采样的消息处理过程：附加属性与按顺序记录的各阶段耗时
+    """
+    __slots__ = ("attrs", "spans", "start")
+
+    def __init__(self, attrs: dict[str, Any]):
+        self.attrs = attrs
+        self.spans: list[tuple[str, float, float]] = []
+        self.start = time.perf_counter()
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "time": time.time(),
+            **self.attrs,
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "spans": [{"name": name, "start_ms": round(start * 1000, 3), "ms": round(duration * 1000, 3)}
+                      for name, start, duration in self.spans],
+        }, ensure_ascii=False, default=str)
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        now = time.perf_counter()
+        self.trace.spans.append((self.name, self.start - self.trace.start, now - self.start))
+        if exc_type is not None: self.trace.attrs.setdefault("error", f"{self.name}: {exc_type.__name__}")
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc, tb): ...
+
+_NULL_SPAN = _NullSpan()
+_current: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("telegram_chat_trace", default=None)
+
+class Tracer:
+    """
+    按 sample_rate 对消息处理过程采样，以 JSON Lines 写入滚动日志文件
+
+    未启用或未被采样时每条消息只多一次随机数比较
+    """
+    def __init__(self):
+        self.sample_rate = 0.0
+        self._handler: RotatingFileHandler | None = None
+
+    def configure(self, path: str, sample_rate: float, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 3):
+        self.close()
+        if sample_rate <= 0: return
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._handler = handler
+        self.sample_rate = min(sample_rate, 1.0)
+
+    def begin(self, **attrs) -> contextvars.Token | None:
+        """
+        按采样率开始一次追踪，返回交给 finish() 的令牌；未被采样时返回 None
+        """
+        if self._handler is None or random.random() >= self.sample_rate: return None
+        return _current.set(Trace(attrs))
+
+    def finish(self, token: contextvars.Token | None):
+        if token is None: return
+        trace = _current.get()
+        _current.reset(token)
+        handler = self._handler
+        if trace is None or handler is None: return
+        handler.handle(logging.makeLogRecord({"msg": trace.to_json(), "levelno": logging.INFO, "levelname": "INFO"}))
+
+    def close(self):
+        if self._handler is not None: self._handler.close()
+        self._handler = None
+        self.sample_rate = 0.0
+
+tracer = Tracer()
+
+def span(name: str) -> _Span | _NullSpan:
+    """
+    记录 with 代码块在当前追踪中的耗时，当前消息未被采样时不做任何事
+    """
+    trace = _current.get()
+    return _NULL_SPAN if trace is None else _Span(trace, name)
+
+def annotate(**attrs):
+    """
+    为当前追踪附加属性
+    """
+    trace = _current.get()
+    if trace is not None: trace.attrs.update(attrs)
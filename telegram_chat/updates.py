@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Awaitable, Coroutine
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    并发处理 Update：最多 workers 个处理器同时运行，
+    同一聊天或同一用户的 Update 严格按到达顺序依次处理
+
+    PTB 按到达顺序为每个 Update 创建任务并调用 do_process_update，
+    这里在第一次 await 之前登记到对应聊天与用户的队尾，保证顺序与到达一致；
+    父类的信号量只用来限制排队的 Update 总数（max_queued）
+    """
+    def __init__(self, workers: int, max_queued: int = 256):
+        super().__init__(max(workers, max_queued))
+        self.workers = workers
+        self.running = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(workers)
+        # (类型, ID) -> 该聊天或用户最后一个 Update 完成时的 Future
+        self._tails: dict[tuple[str, int], asyncio.Future] = {}
+
+    @staticmethod
+    def _keys(update: object) -> list[tuple[str, int]]:
+        if not isinstance(update, Update): return []
+        keys = []
+        if update.effective_chat is not None: keys.append(("chat", update.effective_chat.id))
+        if update.effective_user is not None: keys.append(("user", update.effective_user.id))
+        return keys
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        keys = self._keys(update)
+        done = asyncio.get_running_loop().create_future()
+        previous = {self._tails[key] for key in keys if key in self._tails}
+        for key in keys: self._tails[key] = done
+
+        started = False
+        self.waiting += 1
+        try:
+            # asyncio.wait 被取消时不会取消前一个 Update 的 Future
+            if previous: await asyncio.wait(previous)
+            async with self._slots:
+                self.waiting -= 1
+                self.running += 1
+                started = True
+                try:
+                    await coroutine
+                finally:
+                    self.running -= 1
+        finally:
+            if not started:
+                self.waiting -= 1
+                if isinstance(coroutine, Coroutine): coroutine.close()
+            done.set_result(None)
+            for key in keys:
+                if self._tails.get(key) is done: del self._tails[key]
+
+    async def initialize(self): ...
+
+    async def shutdown(self): ...
@@ -0,0 +1,122 @@
+import asyncio
+import hmac
+import json
+import logging
+import re
+from typing import Awaitable, Callable
+
+from telegram import Bot, Update
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+# Telegram 允许的 secret_token 格式
+SECRET_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,256}")
+
+class WebhookServer:
+    """
+    接收 Telegram Webhook 推送的轻量 HTTP 服务器，运行在 Bot 的事件循环上
+
+    只接受发往 path 的 POST 请求，校验密钥后把请求体解析为 Update 交给 put_update；
+    secret_token 必须提供，每个请求（包括保持连接时等待下一个请求）最多读取 read_timeout 秒
+    """
+    max_body_size: int = 1 << 20
+
+    def __init__(self, logger: logging.Logger, bot: Bot, put_update: Callable[[Update], Awaitable[None]],
+                 listen: str = "127.0.0.1", port: int = 8443, path: str = "/telegram", secret_token: str = "",
+                 read_timeout: float = 10):
+        if not SECRET_PATTERN.fullmatch(secret_token or ""):
+            raise ValueError("Webhook secret_token must be 1-256 characters of A-Z, a-z, 0-9, _ and -.")
+        self.logger = logger
+        self.bot = bot
+        self.put_update = put_update
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self._secret = secret_token.encode("latin-1")
+        self.read_timeout = read_timeout
+        self.server: asyncio.Server | None = None
+        self._connections: set[asyncio.StreamWriter] = set()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.listen, self.port)
+        if self.port == 0:
+            self.port = self.server.sockets[0].getsockname()[1]
+        self.logger.info(f"Webhook listening on {self.listen}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self.server is None: return
+        self.server.close()
+        # 关闭保持中的连接，否则 wait_closed() 会等待它们
+        for writer in list(self._connections): writer.close()
+        await self.server.wait_closed()
+        self.server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            while await self._handle_request(reader, writer): ...
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, ValueError): ...
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        """
+        处理一个请求，返回是否保持连接
+        """
+        head = await asyncio.wait_for(self._read_head(reader), self.read_timeout)
+        if head is None: return False
+        method, target, version, headers = head
+
+        length = int(headers.get("content-length", 0))
+        if length > self.max_body_size:
+            await self._respond(writer, 413, False)
+            return False
+        body = await asyncio.wait_for(reader.readexactly(length), self.read_timeout) if length else b""
+        keep_alive = version.strip() == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+        if target.split("?", 1)[0] != self.path:
+            await self._respond(writer, 404, keep_alive)
+        elif method != "POST":
+            await self._respond(writer, 405, keep_alive)
+        elif not hmac.compare_digest(headers.get(SECRET_HEADER, "").encode("latin-1"), self._secret):
+            self.logger.warning("Rejected webhook request with an invalid secret token.")
+            await self._respond(writer, 403, keep_alive)
+        else:
+            try:
+                update = Update.de_json(json.loads(body), self.bot)
+            except Exception as e:
+                self.logger.warning(f"Unable to decode webhook update: {e}")
+                await self._respond(writer, 400, keep_alive)
+                return keep_alive
+            if update is not None: await self.put_update(update)
+            await self._respond(writer, 200, keep_alive)
+        return keep_alive
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader) -> tuple[str, str, str, dict[str, str]] | None:
+        """
+        读取请求行与请求头，连接关闭时返回 None
+        """
+        request_line = await reader.readline()
+        if not request_line: return None
+        method, target, version = request_line.decode("latin-1").split(" ", 2)
+
+        headers: dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""): break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, keep_alive: bool):
+        reason = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+                  405: "Method Not Allowed", 413: "Payload Too Large"}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Length: 0\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()